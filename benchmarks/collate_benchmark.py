@@ -0,0 +1,89 @@
+r"""Compare batch assembly of collate_fn before and after preallocation.
+
+    python -m TTS.benchmarks.collate_benchmark --batch_size 128
+"""
+import argparse
+import timeit
+import torch
+import numpy as np
+
+from TTS.utils.data import prepare_time_major_tensor, prepare_stop_target
+
+
+def _legacy_prepare_tensor(inputs, out_steps):
+    max_len = max((x.shape[1] for x in inputs)) + 1
+    remainder = max_len % out_steps
+    pad_len = max_len + (out_steps - remainder) if remainder > 0 else max_len
+    return np.stack([np.pad(x, [[0, 0], [0, pad_len - x.shape[1]]],
+                            mode='constant', constant_values=0)
+                     for x in inputs])
+
+
+def _legacy_prepare_stop_target(inputs, out_steps):
+    max_len = max((x.shape[0] for x in inputs)) + 1
+    remainder = max_len % out_steps
+    pad_len = max_len + (out_steps - remainder) if remainder > 0 else max_len
+    return np.stack([np.pad(x, (0, pad_len - x.shape[0]), mode='constant',
+                            constant_values=1.) for x in inputs])
+
+
+def legacy_collate(linear, mel, r):
+    """D x T inputs, the batch assembly collate_fn used to do"""
+    mel_lengths = [m.shape[1] + 1 for m in mel]
+    stop_targets = [np.array([0.] * (mel_len - 1)) for mel_len in mel_lengths]
+    stop_targets = _legacy_prepare_stop_target(stop_targets, r)
+    linear = _legacy_prepare_tensor(linear, r).transpose(0, 2, 1)
+    mel = _legacy_prepare_tensor(mel, r).transpose(0, 2, 1)
+    return (torch.FloatTensor(linear), torch.FloatTensor(mel),
+            torch.FloatTensor(stop_targets))
+
+
+def collate(linear, mel, r):
+    """T x D inputs written into preallocated B x T x D batches"""
+    mel_lengths = [m.shape[0] + 1 for m in mel]
+    stop_targets = [np.zeros(mel_len - 1, dtype=np.float32)
+                    for mel_len in mel_lengths]
+    stop_targets = prepare_stop_target(stop_targets, r)
+    linear = prepare_time_major_tensor(linear, r)
+    mel = prepare_time_major_tensor(mel, r)
+    return (torch.from_numpy(linear), torch.from_numpy(mel),
+            torch.from_numpy(stop_targets))
+
+
+def main(args):
+    lengths = np.random.randint(args.min_len, args.max_len,
+                                size=args.batch_size)
+    linear = [np.random.rand(args.num_freq, l).astype('float32')
+              for l in lengths]
+    mel = [np.random.rand(args.num_mels, l).astype('float32')
+           for l in lengths]
+    # the same features time-major, as views like collate_fn gets them
+    linear_t = [x.T for x in linear]
+    mel_t = [x.T for x in mel]
+
+    for old, new in zip(legacy_collate(linear, mel, args.r),
+                        collate(linear_t, mel_t, args.r)):
+        assert old.shape == new.shape and torch.equal(old, new.float())
+
+    old_time = min(timeit.repeat(lambda: legacy_collate(linear, mel, args.r),
+                                 number=1, repeat=args.repeat))
+    new_time = min(timeit.repeat(lambda: collate(linear_t, mel_t, args.r),
+                                 number=1, repeat=args.repeat))
+    print(" > Batch size {}, frames in [{}, {})".format(
+        args.batch_size, args.min_len, args.max_len))
+    print(" | > Before : {:.2f} ms".format(old_time * 1000))
+    print(" | > After  : {:.2f} ms".format(new_time * 1000))
+    print(" | > Speedup: {:.2f}x".format(old_time / new_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=128)
+    parser.add_argument('--min_len', type=int, default=100)
+    parser.add_argument('--max_len', type=int, default=800)
+    parser.add_argument('--num_freq', type=int, default=1025)
+    parser.add_argument('--num_mels', type=int, default=80)
+    parser.add_argument('--r', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args)
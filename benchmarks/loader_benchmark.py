@@ -0,0 +1,143 @@
+r"""Measure how fast LJSpeechDataset and its collate_fn deliver batches,
+without a model.
+
+    python -m TTS.benchmarks.loader_benchmark --config_path config.json \
+        --num_workers 0,4,8 --batch_sizes 32,128 --modes wav,packed,features
+
+For every combination it reports samples/s, batches/s and p50/p99 batch
+latency of the DataLoader. A single process pass then splits the time of
+a batch into wav decode, STFT, mel (magnitude, mel, dB, normalization)
+and padding.
+"""
+import os
+import time
+import argparse
+import numpy as np
+from torch.utils.data import DataLoader
+
+from TTS.utils.generic_utils import load_config
+from TTS.utils.data import prepare_time_major_tensor, prepare_stop_target
+from TTS.datasets.LJSpeech import LJSpeechDataset
+
+
+def _csv_list(value, type_fn=int):
+    return [type_fn(x) for x in value.split(',')]
+
+
+def load_dataset(c, meta_file, mode):
+    kwargs = {}
+    if mode == 'packed':
+        kwargs['packed_audio_path'] = c.packed_audio_path
+    elif mode == 'features':
+        kwargs['feature_path'] = c.feature_path
+    return LJSpeechDataset(os.path.join(c.data_path, meta_file),
+                           os.path.join(c.data_path, 'wavs'),
+                           c.r,
+                           c.sample_rate,
+                           c.text_cleaner,
+                           c.num_mels,
+                           c.min_level_db,
+                           c.frame_shift_ms,
+                           c.frame_length_ms,
+                           c.preemphasis,
+                           c.ref_level_db,
+                           c.num_freq,
+                           c.power,
+                           stft_backend=c.stft_backend,
+                           **kwargs)
+
+
+def measure_loader(dataset, batch_size, num_workers, num_batches):
+    r"""Time consecutive batches of a shuffled DataLoader"""
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True,
+                        collate_fn=dataset.collate_fn, drop_last=True,
+                        num_workers=num_workers)
+    latencies = []
+    num_samples = 0
+    start_time = time.time()
+    last_time = start_time
+    for i, batch in enumerate(loader):
+        now = time.time()
+        latencies.append(now - last_time)
+        last_time = now
+        num_samples += batch[0].shape[0]
+        if i + 1 == num_batches:
+            break
+    total_time = time.time() - start_time
+    latencies = np.array(latencies)
+    return {'samples/s': num_samples / total_time,
+            'batches/s': len(latencies) / total_time,
+            'p50 (ms)': np.percentile(latencies, 50) * 1000,
+            'p99 (ms)': np.percentile(latencies, 99) * 1000}
+
+
+def profile_stages(dataset, batch_size, num_batches):
+    r"""Average time per batch of each collate stage in this process"""
+    ap = dataset.ap
+    stages = {'decode': 0., 'stft': 0., 'mel': 0., 'padding': 0.}
+    idxs = np.random.permutation(len(dataset))
+    for b in range(num_batches):
+        batch_idxs = idxs[b * batch_size:(b + 1) * batch_size]
+        start_time = time.time()
+        samples = [dataset[i] for i in batch_idxs]
+        stages['decode'] += time.time() - start_time
+        if 'linear' in samples[0]:
+            linear = [s['linear'] for s in samples]
+            mel = [s['mel'] for s in samples]
+        else:
+            start_time = time.time()
+            S = [np.abs(ap._stft(ap.apply_preemphasis(s['wav'])))
+                 for s in samples]
+            stages['stft'] += time.time() - start_time
+            start_time = time.time()
+            features = [ap._magnitudes_to_features(x) for x in S]
+            linear = [f[0].T for f in features]
+            mel = [f[1].T for f in features]
+            stages['mel'] += time.time() - start_time
+        start_time = time.time()
+        prepare_stop_target([np.zeros(m.shape[0], dtype=np.float32)
+                             for m in mel], dataset.outputs_per_step)
+        prepare_time_major_tensor(linear, dataset.outputs_per_step)
+        prepare_time_major_tensor(mel, dataset.outputs_per_step)
+        stages['padding'] += time.time() - start_time
+    return {k: v / num_batches * 1000 for k, v in stages.items()}
+
+
+def main(args):
+    c = load_config(args.config_path)
+    if args.data_path:
+        c.data_path = args.data_path
+    for mode in _csv_list(args.modes, str):
+        dataset = load_dataset(c, args.meta_file, mode)
+        for batch_size in _csv_list(args.batch_sizes):
+            num_batches = min(args.num_batches, len(dataset) // batch_size)
+            stages = profile_stages(dataset, batch_size,
+                                    max(1, num_batches // 4))
+            print(" > Mode: {} - batch size: {} - stages per batch: {}".format(
+                mode, batch_size, ', '.join('{} {:.1f} ms'.format(k, v)
+                                            for k, v in stages.items())))
+            for num_workers in _csv_list(args.num_workers):
+                stats = measure_loader(dataset, batch_size, num_workers,
+                                       num_batches)
+                print(" | > workers: {:2d} - {}".format(
+                    num_workers, ' - '.join('{}: {:.1f}'.format(k, v)
+                                            for k, v in stats.items())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_path', type=str,
+                        help='path to config file for training')
+    parser.add_argument('--data_path', type=str, default=None,
+                        help='overrides data_path of the config')
+    parser.add_argument('--meta_file', type=str, default='metadata_train.csv')
+    parser.add_argument('--num_workers', type=str, default='0,4,8',
+                        help='comma separated num_loader_workers to sweep')
+    parser.add_argument('--batch_sizes', type=str, default='32',
+                        help='comma separated batch sizes to sweep')
+    parser.add_argument('--modes', type=str, default='wav',
+                        help='comma separated subset of wav, packed, features')
+    parser.add_argument('--num_batches', type=int, default=50,
+                        help='number of batches timed per setting')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,99 @@
+r"""Compare vocoding from the postnet linear outputs with vocoding from the
+decoder mel outputs through AudioProcessor.mel_to_linear.
+
+    python -m TTS.benchmarks.postnet_benchmark --config_path config.json \
+        --checkpoint_path best_model.pth.tar --num_utterances 20
+
+Utterances of the validation set run one at a time on CPU, decoding as
+many frames as their targets so that outputs line up. It reports the
+model time with and without the postnet, the time of the mel inversion
+and of Griffin-Lim, and the mean absolute error (normalized and in dB) of
+the linear spectrograms against the targets, for the postnet, for
+mel_to_linear of the mel outputs and for mel_to_linear of the target mels
+(the error of the inversion alone).
+"""
+import time
+import argparse
+import numpy as np
+import torch
+
+from TTS.utils.generic_utils import load_config
+from TTS.models.tacotron import Tacotron
+from TTS.benchmarks.loader_benchmark import load_dataset
+
+
+def _timed(fn):
+    start_time = time.time()
+    out = fn()
+    return out, (time.time() - start_time) * 1000
+
+
+def main(args):
+    c = load_config(args.config_path)
+    if args.data_path:
+        c.data_path = args.data_path
+    torch.set_num_threads(args.num_threads)
+    dataset = load_dataset(c, args.meta_file, 'wav')
+    ap = dataset.ap
+    ap.griffin_lim_iters = c.griffin_lim_iters
+    model = Tacotron(c.embedding_size, c.num_freq, c.num_mels, c.r)
+    if args.checkpoint_path:
+        checkpoint = torch.load(args.checkpoint_path, map_location='cpu')
+        model.load_state_dict(checkpoint['model'])
+    else:
+        print(" !! No checkpoint, errors of an untrained model are "
+              "meaningless")
+    model.eval()
+    times = {'postnet model': [], 'mel model': [], 'mel_to_linear': [],
+             'griffin-lim': []}
+    errors = {'postnet': [], 'mel_to_linear': [], 'mel_to_linear target': []}
+    num_utterances = min(args.num_utterances, len(dataset))
+    for i in range(num_utterances):
+        batch = dataset.collate_fn([dataset[i]])
+        text, linear, mel, mel_lengths = batch[0], batch[2], batch[3], \
+            batch[4]
+        length = int(mel_lengths[0]) - 1  # without the zero frame
+        target = linear[0, :length].numpy().T
+        with torch.no_grad():
+            (_, linear_out, _), t = _timed(lambda: model.forward(text, mel))
+            times['postnet model'].append(t)
+            (mel_out, _, _), t = _timed(lambda: model.forward(
+                text, mel, postnet=False))
+            times['mel model'].append(t)
+        mel_out = mel_out[0, :length].numpy().T
+        linear_hat, t = _timed(lambda: ap.mel_to_linear(mel_out,
+                                                        args.method))
+        times['mel_to_linear'].append(t)
+        _, t = _timed(lambda: ap.inv_spectrogram(linear_hat))
+        times['griffin-lim'].append(t)
+        estimates = {'postnet': linear_out[0, :length].numpy().T,
+                     'mel_to_linear': linear_hat,
+                     'mel_to_linear target': ap.mel_to_linear(
+                         mel[0, :length].numpy().T, args.method)}
+        for name, estimate in estimates.items():
+            errors[name].append(np.abs(estimate - target).mean())
+    print(" > {} utterances, {} mel inversion".format(num_utterances,
+                                                     args.method))
+    print(" | > " + ' - '.join('{}: {:.1f} ms'.format(k, np.mean(v))
+                               for k, v in times.items()))
+    for name, values in errors.items():
+        print(" | > {:22s} L1: {:.4f} ({:.2f} dB)".format(
+            name, np.mean(values), np.mean(values) * -ap.min_level_db))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_path', type=str,
+                        help='path to config file for training')
+    parser.add_argument('--checkpoint_path', type=str, default=None,
+                        help='model checkpoint, random weights if not given')
+    parser.add_argument('--data_path', type=str, default=None,
+                        help='overrides data_path of the config')
+    parser.add_argument('--meta_file', type=str, default='metadata_val.csv')
+    parser.add_argument('--num_utterances', type=int, default=20)
+    parser.add_argument('--method', type=str, default='pinv',
+                        help='mel inversion, pinv or nnls')
+    parser.add_argument('--num_threads', type=int, default=1,
+                        help='torch CPU threads')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,87 @@
+r"""Compare the STFT backends of AudioProcessor on this host.
+
+    python -m TTS.benchmarks.stft_benchmark --config_path config.json \
+        --backends librosa,numpy,torch --seconds 2,8 --batch_size 32
+
+For every backend and utterance length it reports the time of one STFT,
+one inverse STFT and a single utterance Griffin-Lim (```griffin_lim_iters```
+of the config), the time per utterance of batched linear and mel features,
+and the largest difference of the features from the librosa backend.
+"""
+import time
+import argparse
+import numpy as np
+
+from TTS.utils.generic_utils import load_config
+from TTS.utils.audio import AudioProcessor
+
+
+def _csv_list(value, type_fn=str):
+    return [type_fn(x) for x in value.split(',')]
+
+
+def _time(fn, repeats):
+    fn()  # warm up caches
+    start_time = time.time()
+    for _ in range(repeats):
+        fn()
+    return (time.time() - start_time) / repeats * 1000
+
+
+def make_ap(c, backend):
+    return AudioProcessor(c.sample_rate, c.num_mels, c.min_level_db,
+                          c.frame_shift_ms, c.frame_length_ms, c.preemphasis,
+                          c.ref_level_db, c.num_freq, c.power,
+                          griffin_lim_iters=c.griffin_lim_iters,
+                          stft_backend=backend)
+
+
+def measure_backend(ap, wavs, repeats):
+    r"""Milliseconds per call of each stage on ```wavs```"""
+    wav = wavs[0]
+    D = ap._stft(wav)
+    spec = ap.spectrogram(wav)
+    return {'stft': _time(lambda: ap._stft(wav), repeats),
+            'istft': _time(lambda: ap._istft(D), repeats),
+            'griffin-lim': _time(lambda: ap.inv_spectrogram(spec), 1),
+            'features/utt': _time(
+                lambda: ap.batch_linear_and_mel_spectrogram(wavs),
+                1) / len(wavs)}
+
+
+def main(args):
+    c = load_config(args.config_path)
+    reference = make_ap(c, 'librosa')
+    for seconds in _csv_list(args.seconds, float):
+        num_samples = int(seconds * c.sample_rate)
+        wavs = [(0.1 * np.random.randn(num_samples - 97 * i)).astype(
+            np.float32) for i in range(args.batch_size)]
+        linears, mels = reference.batch_linear_and_mel_spectrogram(wavs)
+        print(" > {:.1f} s utterances, batches of {}".format(
+            seconds, args.batch_size))
+        for backend in _csv_list(args.backends):
+            ap = make_ap(c, backend)
+            stats = measure_backend(ap, wavs, args.repeats)
+            linear, mel = ap.batch_linear_and_mel_spectrogram(wavs)
+            diff = max(max(np.abs(x - y).max() for x, y in zip(linear,
+                                                               linears)),
+                       max(np.abs(x - y).max() for x, y in zip(mel, mels)))
+            print(" | > {:8s} - {} - max feature diff: {:.2e}".format(
+                backend, ' - '.join('{}: {:.1f} ms'.format(k, v)
+                                    for k, v in stats.items()), diff))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_path', type=str,
+                        help='path to config file for training')
+    parser.add_argument('--backends', type=str, default='librosa,numpy,torch',
+                        help='comma separated STFT backends to compare')
+    parser.add_argument('--seconds', type=str, default='2,8',
+                        help='comma separated utterance lengths')
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help='number of utterances of the feature batches')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='number of timed STFT and inverse STFT calls')
+    args = parser.parse_args()
+    main(args)
@@ -1,14 +1,52 @@
 import os
+import json
 import numpy as np
-import collections
-import librosa
+import collections.abc
 import torch
+from multiprocessing import Pool
 from torch.utils.data import Dataset
 
 from TTS.utils.text import text_to_sequence
 from TTS.utils.audio import AudioProcessor
-from TTS.utils.data import (prepare_data, pad_per_step,
-                            prepare_tensor, prepare_stop_target)
+from TTS.utils.feature_store import FeatureStore, dequantize
+from TTS.utils.packed_audio import PackedAudio
+from TTS.utils.duration_index import DurationIndex
+from TTS.utils.resample import load_wav
+from TTS.datasets.manifest import Manifest
+from TTS.utils.data import (prepare_data, pad_per_step, gather_ranges,
+                            prepare_time_major_tensor, prepare_stop_target)
+
+# fewer texts per process do not pay off the start of the process
+_MIN_TEXTS_PER_WORKER = 2000
+
+
+def _tokenize(args):
+    text, cleaners = args
+    return text_to_sequence(text, cleaners)
+
+
+def tokenize_all(texts, cleaners, num_workers=1):
+    r"""Convert texts to symbol ids, in up to ```num_workers``` processes
+    for large sets and serially for small ones. Returns a flat int32 array
+    of all sequences and N+1 offsets, the ids of the i-th text being
+    ```tokens[offsets[i]:offsets[i+1]]```."""
+    jobs = [(text, cleaners) for text in texts]
+    num_workers = min(num_workers, len(jobs) // _MIN_TEXTS_PER_WORKER)
+    if num_workers > 1:
+        pool = Pool(num_workers)
+        try:
+            sequences = pool.map(_tokenize, jobs, chunksize=256)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        sequences = [_tokenize(job) for job in jobs]
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(seq) for seq in sequences])
+    tokens = np.zeros(offsets[-1], dtype=np.int32)
+    for i, seq in enumerate(sequences):
+        tokens[offsets[i]:offsets[i + 1]] = seq
+    return tokens, offsets
 
 
 class LJSpeechDataset(Dataset):
@@ -16,60 +54,222 @@ class LJSpeechDataset(Dataset):
     def __init__(self, csv_file, root_dir, outputs_per_step, sample_rate,
                  text_cleaner, num_mels, min_level_db, frame_shift_ms,
                  frame_length_ms, preemphasis, ref_level_db, num_freq, power,
-                 min_seq_len=0):
+                 min_seq_len=0, feature_path=None, packed_audio_path=None,
+                 index_path=None, return_wavs=False, duration_index_path=None,
+                 min_audio_frames=0, max_audio_frames=None,
+                 resample_quality='medium', stft_backend='librosa',
+                 tokenize_workers=1):
 
-        with open(csv_file, "r") as f:
-            self.frames = [line.split('|') for line in f]
         self.root_dir = root_dir
         self.outputs_per_step = outputs_per_step
         self.sample_rate = sample_rate
         self.cleaners = text_cleaner
         self.min_seq_len = min_seq_len
+        self.return_wavs = return_wavs
+        self.resample_quality = resample_quality
+        self.tokenize_workers = tokenize_workers
         self.ap = AudioProcessor(sample_rate, num_mels, min_level_db, frame_shift_ms,
-                                 frame_length_ms, preemphasis, ref_level_db, num_freq, power)
+                                 frame_length_ms, preemphasis, ref_level_db, num_freq, power,
+                                 stft_backend=stft_backend)
+        # shared by forked loader workers
+        self.ap.warm_cache()
         print(" > Reading LJSpeech from - {}".format(root_dir))
-        print(" | > Number of instances : {}".format(len(self.frames)))
-        self._sort_frames()
+        if index_path is None or not self._load_index(index_path, csv_file):
+            self.manifest = Manifest.from_csv(csv_file)
+            print(" | > Number of instances : {}".format(len(self.manifest)))
+            self._sort_frames()
+            self._tokenize_frames()
+            if index_path is not None:
+                self._save_index(index_path, csv_file)
+        self.feature_store = None
+        self.feature_idxs = None
+        self.packed_audio_idxs = None
+        self.audio_frames = None
+        if feature_path is not None:
+            assert not return_wavs, \
+                " !! return_wavs needs waveforms, not a feature store"
+            self._load_feature_store(feature_path)
+        self.packed_audio = None
+        if packed_audio_path is not None:
+            self._load_packed_audio(packed_audio_path)
+        self.audio_frames = self._load_audio_frames(duration_index_path)
+        if min_audio_frames > 0 or max_audio_frames is not None:
+            assert self.audio_frames is not None, \
+                " !! Audio length filters need a duration index, packed" \
+                " audio or a feature store"
+            self._filter_audio_frames(min_audio_frames, max_audio_frames)
+
+    def _index_meta(self, csv_file):
+        return {'csv_file': os.path.abspath(csv_file),
+                'csv_mtime': os.path.getmtime(csv_file),
+                'min_seq_len': self.min_seq_len,
+                'cleaners': self.cleaners}
+
+    def _load_index(self, index_path, csv_file):
+        r"""Load the sorted manifest and tokens from a binary index file
+        written by a previous run. Returns False if the file is missing or
+        stale."""
+        if not os.path.exists(index_path):
+            return False
+        arrays = np.load(index_path)
+        meta = json.loads(str(arrays['meta']))
+        if meta != self._index_meta(csv_file):
+            print(" | > Index {} is stale, rebuilding".format(index_path))
+            return False
+        self.manifest = Manifest.from_arrays(arrays)
+        self.tokens = arrays['tokens']
+        self.token_offsets = arrays['token_offsets']
+        self.tokens.flags.writeable = False
+        self.token_offsets.flags.writeable = False
+        print(" | > Number of instances : {} (from index {})".format(
+            len(self.manifest), index_path))
+        return True
+
+    def _save_index(self, index_path, csv_file):
+        meta = json.dumps(self._index_meta(csv_file))
+        with open(index_path, 'wb') as f:
+            np.savez(f, meta=np.array(meta), tokens=self.tokens,
+                     token_offsets=self.token_offsets,
+                     **self.manifest.to_arrays())
+        print(" | > Index is saved to {}".format(index_path))
+
+    def _tokenize_frames(self):
+        r"""Tokenize all transcripts once. A single flat array stays shared
+        by forked loader workers instead of being rebuilt every epoch."""
+        self.tokens, self.token_offsets = tokenize_all(
+            [self.manifest.get_text(i) for i in range(len(self.manifest))],
+            [self.cleaners], self.tokenize_workers)
+        self.tokens.flags.writeable = False
+        self.token_offsets.flags.writeable = False
+
+    def _find_items(self, store, path):
+        r"""Positions of all instances in a preprocessing output. Instances
+        whose file it recorded as unreadable are dropped."""
+        failed = np.isin(self.manifest.ids, store.failed_ids)
+        if failed.any():
+            print(" | > {} instances are ignored as unreadable in {}".format(
+                np.sum(failed), path))
+            self._subset(np.where(~failed)[0])
+        idxs = store.find(self.manifest.ids)
+        if (idxs < 0).any():
+            missing = self.manifest.ids[idxs < 0]
+            raise KeyError(" !! {} instances are not in {} (e.g. {})".format(
+                len(missing), path, missing[0]))
+        return idxs
+
+    def _load_feature_store(self, feature_path):
+        r"""Read precomputed features instead of computing them per batch"""
+        self.feature_store = FeatureStore(feature_path)
+        self.feature_store.check_params(self.ap)
+        self.feature_idxs = self._find_items(self.feature_store, feature_path)
+        print(" | > Reading features from - {}".format(feature_path))
+
+    def _load_packed_audio(self, packed_audio_path):
+        r"""Read resampled waveforms from a packed corpus instead of wav
+        files"""
+        self.packed_audio = PackedAudio(packed_audio_path)
+        self.packed_audio.check_sample_rate(self.sample_rate)
+        self.packed_audio_idxs = self._find_items(self.packed_audio,
+                                                  packed_audio_path)
+        print(" | > Reading packed audio from - {}".format(packed_audio_path))
+
+    def _load_audio_frames(self, duration_index_path):
+        r"""Exact number of decoder frames of each instance, taken from
+        the feature store, the packed audio or a duration index of wav
+        headers. None if none of them is given."""
+        if self.feature_store is not None:
+            return self.feature_store.lengths[self.feature_idxs]
+        if self.packed_audio is not None:
+            lengths = self.packed_audio.lengths[self.packed_audio_idxs]
+        elif duration_index_path is not None:
+            index = DurationIndex(duration_index_path)
+            index.check_sample_rate(self.sample_rate)
+            lengths = index.lengths[self._find_items(index,
+                                                     duration_index_path)]
+        else:
+            return None
+        return self.ap.num_frames(lengths)
+
+    def _filter_audio_frames(self, min_audio_frames, max_audio_frames):
+        r"""Drop instances outside of the given number of decoder
+        frames"""
+        keep = self.audio_frames >= min_audio_frames
+        if max_audio_frames is not None:
+            keep &= self.audio_frames <= max_audio_frames
+        print(" | > {} instances are ignored by min/max_audio_frames"
+              " ({}, {})".format(np.sum(~keep), min_audio_frames,
+                                 max_audio_frames))
+        self._subset(np.where(keep)[0])
+
+    def _subset(self, idxs):
+        r"""Keep only the given instances"""
+        self.manifest = self.manifest.subset(idxs)
+        self.tokens, self.token_offsets = gather_ranges(
+            self.tokens, self.token_offsets, idxs)
+        self.tokens.flags.writeable = False
+        self.token_offsets.flags.writeable = False
+        if self.feature_idxs is not None:
+            self.feature_idxs = self.feature_idxs[idxs]
+        if self.packed_audio_idxs is not None:
+            self.packed_audio_idxs = self.packed_audio_idxs[idxs]
+        if self.audio_frames is not None:
+            self.audio_frames = self.audio_frames[idxs]
 
     def load_wav(self, filename):
         try:
-            audio = librosa.core.load(filename, sr=self.sample_rate)
-            return audio
+            wav = load_wav(filename, self.sample_rate, self.resample_quality)
         except RuntimeError as e:
-            print(" !! Cannot read file : {}".format(filename))
+            # only preprocessing outputs record unreadable files, so fail
+            # here with the name rather than later in collate_fn
+            raise RuntimeError(" !! Cannot read file : {} ({})".format(
+                filename, e))
+        return wav, self.sample_rate
 
     def _sort_frames(self):
         r"""Sort sequences in ascending order"""
-        lengths = np.array([len(ins[1]) for ins in self.frames])
+        lengths = self.manifest.text_lengths
 
         print(" | > Max length sequence {}".format(np.max(lengths)))
         print(" | > Min length sequence {}".format(np.min(lengths)))
         print(" | > Avg length sequence {}".format(np.mean(lengths)))
 
-        idxs = np.argsort(lengths)
-        new_frames = []
-        ignored = []
-        for i, idx in enumerate(idxs):
-            length = lengths[idx]
-            if length < self.min_seq_len:
-                ignored.append(idx)
-            else:
-                new_frames.append(self.frames[idx])
+        idxs = np.argsort(lengths, kind='stable')
+        keep = lengths[idxs] >= self.min_seq_len
         print(" | > {} instances are ignored by min_seq_len ({})".format(
-            len(ignored), self.min_seq_len))
-        self.frames = new_frames
+            np.sum(~keep), self.min_seq_len))
+        self.manifest = self.manifest.subset(idxs[keep])
+
+    def get_frame_lengths(self):
+        r"""Length of each instance for length aware batch samplers. These
+        are decoder frames if a feature store, packed audio or a duration
+        index is used, otherwise transcript lengths as a proxy."""
+        if self.audio_frames is not None:
+            return self.audio_frames.copy()
+        return self.manifest.text_lengths.copy()
+
+    def get_text_lengths(self):
+        r"""Number of text tokens of each instance"""
+        return np.diff(self.token_offsets)
 
     def __len__(self):
-        return len(self.frames)
+        return len(self.manifest)
 
     def __getitem__(self, idx):
-        wav_name = os.path.join(self.root_dir,
-                                self.frames[idx][0]) + '.wav'
-        text = self.frames[idx][1]
-        text = np.asarray(text_to_sequence(
-            text, [self.cleaners]), dtype=np.int32)
-        wav = np.asarray(self.load_wav(wav_name)[0], dtype=np.float32)
-        sample = {'text': text, 'wav': wav, 'item_idx': self.frames[idx][0]}
+        item_id = self.manifest.get_id(idx)
+        wav_name = os.path.join(self.root_dir, item_id) + '.wav'
+        text = self.tokens[self.token_offsets[idx]:self.token_offsets[idx + 1]]
+        if self.feature_store is not None:
+            # dequantized per batch in collate_fn
+            linear, mel = self.feature_store.load_index(self.feature_idxs[idx],
+                                                        raw=True)
+            sample = {'text': text, 'linear': linear, 'mel': mel,
+                      'item_idx': item_id}
+            return sample
+        if self.packed_audio is not None:
+            wav = self.packed_audio.load_index(self.packed_audio_idxs[idx])
+        else:
+            wav = self.load_wav(wav_name)[0]
+        sample = {'text': text, 'wav': wav, 'item_idx': item_id}
         return sample
 
     def get_dummy_data(self):
@@ -83,25 +283,44 @@ class LJSpeechDataset(Dataset):
             2. Convert Audio signal to Spectrograms.
             3. PAD sequences that can be divided by r.
             4. Convert Numpy to Torch tensors.
+
+            With ```return_wavs``` the batch is (text, text_lengths, wav,
+            wav_lengths, item_idx) and targets are computed on the training
+            device by TorchAudioProcessor.
         """
 
         # Puts each data field into a tensor with outer dimension batch size
-        if isinstance(batch[0], collections.Mapping):
+        if isinstance(batch[0], collections.abc.Mapping):
             keys = list()
 
-            wav = [d['wav'] for d in batch]
             item_idxs = [d['item_idx'] for d in batch]
             text = [d['text'] for d in batch]
 
             text_lenghts = np.array([len(x) for x in text])
             max_text_len = np.max(text_lenghts)
 
-            linear = [self.ap.spectrogram(w).astype('float32') for w in wav]
-            mel = [self.ap.melspectrogram(w).astype('float32') for w in wav]
-            mel_lengths = [m.shape[1] + 1 for m in mel]  # +1 for zero-frame
+            if self.return_wavs:
+                wav = [d['wav'] for d in batch]
+                wav_lengths = torch.LongTensor([len(w) for w in wav])
+                wav = torch.from_numpy(prepare_data(wav))
+                text = prepare_data(text).astype(np.int32)
+                return (torch.LongTensor(text),
+                        torch.LongTensor(text_lenghts), wav, wav_lengths,
+                        item_idxs[0])
+
+            # T x D features
+            if 'linear' in batch[0]:
+                linear = [d['linear'] for d in batch]
+                mel = [d['mel'] for d in batch]
+            else:
+                wav = [d['wav'] for d in batch]
+                linear, mel = self.ap.batch_linear_and_mel_spectrogram(wav)
+                linear = [x.T for x in linear]
+                mel = [x.T for x in mel]
+            mel_lengths = [m.shape[0] + 1 for m in mel]  # +1 for zero-frame
 
             # compute 'stop token' targets
-            stop_targets = [np.array([0.]*(mel_len-1))
+            stop_targets = [np.zeros(mel_len - 1, dtype=np.float32)
                             for mel_len in mel_lengths]
 
             # PAD stop targets
@@ -110,25 +329,22 @@ class LJSpeechDataset(Dataset):
 
             # PAD sequences with largest length of the batch
             text = prepare_data(text).astype(np.int32)
-            wav = prepare_data(wav)
-
-            # PAD features with largest length + a zero frame
-            linear = prepare_tensor(linear, self.outputs_per_step)
-            mel = prepare_tensor(mel, self.outputs_per_step)
-            assert mel.shape[2] == linear.shape[2]
-            timesteps = mel.shape[2]
 
-            # B x T x D
-            linear = linear.transpose(0, 2, 1)
-            mel = mel.transpose(0, 2, 1)
+            # PAD features with largest length + a zero frame, B x T x D
+            linear = dequantize(prepare_time_major_tensor(
+                linear, self.outputs_per_step, dtype=linear[0].dtype))
+            mel = dequantize(prepare_time_major_tensor(
+                mel, self.outputs_per_step, dtype=mel[0].dtype))
+            assert mel.shape[1] == linear.shape[1]
+            timesteps = mel.shape[1]
 
             # convert things to pytorch
             text_lenghts = torch.LongTensor(text_lenghts)
             text = torch.LongTensor(text)
-            linear = torch.FloatTensor(linear)
-            mel = torch.FloatTensor(mel)
+            linear = torch.from_numpy(linear)
+            mel = torch.from_numpy(mel)
             mel_lengths = torch.LongTensor(mel_lengths)
-            stop_targets = torch.FloatTensor(stop_targets)
+            stop_targets = torch.from_numpy(stop_targets)
 
             return text, text_lenghts, linear, mel, mel_lengths, stop_targets, item_idxs[0]
 
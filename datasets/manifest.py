@@ -0,0 +1,70 @@
+import numpy as np
+
+from TTS.utils.data import gather_ranges
+
+
+class Manifest(object):
+    r"""Dataset manifest held in a few flat numpy buffers instead of lists
+    of Python strings.
+
+    Forked loader workers touch refcounts of every Python object they
+    read, which slowly copies a list based manifest into each worker. Here
+    ids are a fixed width unicode array and transcripts one utf-8 byte
+    buffer with offsets, so the pages stay shared.
+    """
+
+    def __init__(self, ids, text_data, text_offsets, text_lengths):
+        self.ids = ids
+        self.text_data = text_data
+        self.text_offsets = text_offsets
+        self.text_lengths = text_lengths
+
+    @classmethod
+    def from_texts(cls, ids, texts):
+        encoded = [text.encode('utf-8') for text in texts]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        text_offsets[1:] = np.cumsum([len(x) for x in encoded])
+        text_data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        text_lengths = np.array([len(text) for text in texts], dtype=np.int32)
+        return cls(np.array(ids, dtype=np.str_), text_data, text_offsets,
+                   text_lengths)
+
+    @classmethod
+    def from_csv(cls, csv_file):
+        r"""Read ```id|transcript|...``` lines"""
+        ids = []
+        texts = []
+        with open(csv_file, "r") as f:
+            for line in f:
+                cols = line.split('|')
+                ids.append(cols[0])
+                texts.append(cols[1])
+        return cls.from_texts(ids, texts)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['ids'], arrays['text_data'],
+                   arrays['text_offsets'], arrays['text_lengths'])
+
+    def to_arrays(self):
+        return {'ids': self.ids, 'text_data': self.text_data,
+                'text_offsets': self.text_offsets,
+                'text_lengths': self.text_lengths}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_id(self, idx):
+        return str(self.ids[idx])
+
+    def get_text(self, idx):
+        start, end = self.text_offsets[idx], self.text_offsets[idx + 1]
+        return self.text_data[start:end].tobytes().decode('utf-8')
+
+    def subset(self, idxs):
+        r"""New manifest with the given instances in the given order"""
+        idxs = np.asarray(idxs, dtype=np.int64)
+        text_data, text_offsets = gather_ranges(self.text_data,
+                                                self.text_offsets, idxs)
+        return Manifest(self.ids[idxs], text_data, text_offsets,
+                        self.text_lengths[idxs])
@@ -0,0 +1,162 @@
+import numpy as np
+from torch.utils.data.sampler import Sampler
+
+
+def padding_efficiency(batches, lengths):
+    r"""Ratio of real frames to padded frames over the given batches"""
+    real = 0
+    padded = 0
+    for batch in batches:
+        batch_lengths = lengths[batch]
+        real += batch_lengths.sum()
+        padded += batch_lengths.max() * len(batch)
+    return real / max(1, padded)
+
+
+def _make_buckets(lengths, bucket_width):
+    bucket_ids = lengths // bucket_width
+    return [np.where(bucket_ids == b)[0] for b in np.unique(bucket_ids)]
+
+
+def _bucket_order(buckets):
+    r"""Shuffle each bucket and concatenate them in length order"""
+    return np.concatenate([np.random.permutation(bucket)
+                           for bucket in buckets])
+
+
+class BucketBatchSampler(Sampler):
+    r"""Group instances of similar length into batches, shuffling within
+    and across length buckets each epoch.
+
+    Instances are assigned to buckets of ```bucket_width``` length units.
+    Each epoch every bucket is shuffled, the buckets are concatenated in
+    length order and cut into batches, and the order of the batches is
+    shuffled. Leftovers of a bucket therefore share a batch with the
+    closest lengths of the next bucket.
+
+    Args:
+        lengths: length of each instance (e.g. decoder frames).
+        batch_size: number of instances per batch.
+        bucket_width: length range of a bucket.
+        drop_last: drop the last incomplete batch.
+        length_unit: 'frames', or 'text' if ```lengths``` are transcript
+            lengths, in which case the padding efficiency is only a proxy.
+    """
+
+    def __init__(self, lengths, batch_size, bucket_width, drop_last=False,
+                 length_unit='frames'):
+        self.lengths = np.asarray(lengths)
+        self.length_unit = length_unit
+        self.batch_size = batch_size
+        self.bucket_width = bucket_width
+        self.drop_last = drop_last
+        self.buckets = _make_buckets(self.lengths, bucket_width)
+        self.padding_efficiency = None
+        print(" | > Bucket sampler with {} buckets of width {}".format(
+            len(self.buckets), bucket_width))
+
+    def _make_batches(self):
+        idxs = _bucket_order(self.buckets)
+        batches = [idxs[i:i + self.batch_size]
+                   for i in range(0, len(idxs), self.batch_size)]
+        if self.drop_last and len(batches[-1]) < self.batch_size:
+            batches = batches[:-1]
+        return [batches[i] for i in np.random.permutation(len(batches))]
+
+    def __iter__(self):
+        batches = self._make_batches()
+        self.padding_efficiency = padding_efficiency(batches, self.lengths)
+        print(" | > Padding efficiency ({} lengths) : {:.4f}".format(
+            self.length_unit, self.padding_efficiency))
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+class FrameBudgetBatchSampler(Sampler):
+    r"""Pack instances into batches up to a budget of padded frames, so
+    that memory and step time stay roughly constant regardless of
+    instance lengths.
+
+    Instances are shuffled within length buckets and packed greedily in
+    length order; a batch is closed when adding the next instance would
+    exceed ```max_frames``` padded decoder frames (or ```max_tokens```
+    padded text tokens). The order of the batches is shuffled. The number
+    of batches varies between epochs; the batches of the next epoch are
+    planned ahead so that ```len()``` is exact.
+
+    Args:
+        lengths: decoder frames of each instance.
+        max_frames: budget of padded decoder frames per batch.
+        bucket_width: length range of a shuffling bucket.
+        text_lengths: text length of each instance, required by max_tokens.
+        max_tokens: optional budget of padded text tokens per batch.
+        outputs_per_step: decoder reduction factor r, padded lengths are
+            rounded up to its multiples with a zero-frame as in collate_fn.
+    """
+
+    def __init__(self, lengths, max_frames, bucket_width, text_lengths=None,
+                 max_tokens=None, outputs_per_step=1):
+        self.lengths = np.asarray(lengths)
+        self.max_frames = max_frames
+        self.text_lengths = None if text_lengths is None else \
+            np.asarray(text_lengths)
+        self.max_tokens = max_tokens
+        assert max_tokens is None or text_lengths is not None
+        self.outputs_per_step = outputs_per_step
+        self.length_unit = 'frames'
+        padded = self._padded_length(self.lengths.max())
+        assert padded <= max_frames, \
+            " !! max_frames ({}) is smaller than the longest instance ({})"\
+            .format(max_frames, padded)
+        self.buckets = _make_buckets(self.lengths, bucket_width)
+        self.padding_efficiency = None
+        self._batches = self._make_batches()
+        print(" | > Frame budget sampler with {} frames per batch".format(
+            max_frames))
+
+    def _padded_length(self, length):
+        r = self.outputs_per_step
+        return int(np.ceil((length + 1) / r) * r)
+
+    def _make_batches(self):
+        batches = []
+        batch = []
+        max_len = 0
+        max_text_len = 0
+        for idx in _bucket_order(self.buckets):
+            length = self._padded_length(self.lengths[idx])
+            text_length = 0 if self.max_tokens is None else \
+                self.text_lengths[idx]
+            new_len = max(max_len, length)
+            new_text_len = max(max_text_len, text_length)
+            fits = new_len * (len(batch) + 1) <= self.max_frames
+            if self.max_tokens is not None:
+                fits = fits and \
+                    new_text_len * (len(batch) + 1) <= self.max_tokens
+            if batch and not fits:
+                batches.append(np.array(batch))
+                batch = []
+                new_len, new_text_len = length, text_length
+            batch.append(idx)
+            max_len, max_text_len = new_len, new_text_len
+        if batch:
+            batches.append(np.array(batch))
+        return [batches[i] for i in np.random.permutation(len(batches))]
+
+    def __iter__(self):
+        batches = self._batches
+        self.padding_efficiency = padding_efficiency(batches, self.lengths)
+        print(" | > {} batches, padding efficiency : {:.4f}".format(
+            len(batches), self.padding_efficiency))
+        # plan the next epoch so that len() is right before it starts
+        self._batches = self._make_batches()
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self):
+        return len(self._batches)
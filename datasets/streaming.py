@@ -0,0 +1,198 @@
+import os
+import json
+import numpy as np
+from multiprocessing import Pool
+from torch.utils.data import IterableDataset, get_worker_info
+
+from TTS.utils.text import text_to_sequence
+from TTS.utils.audio import AudioProcessor
+from TTS.utils.build_state import report_trimmed
+from TTS.utils.resample import load_wav
+from TTS.datasets.LJSpeech import LJSpeechDataset
+
+# per record: item id bytes, token count, sample count
+_HEADER = np.dtype([('id_len', '<i4'), ('text_len', '<i4'),
+                    ('wav_len', '<i8')])
+
+
+def write_record(f, item_id, tokens, wav):
+    item_id = item_id.encode('utf-8')
+    header = np.array([(len(item_id), len(tokens), len(wav))], dtype=_HEADER)
+    f.write(header.tobytes())
+    f.write(item_id)
+    f.write(np.asarray(tokens, dtype='<i4').tobytes())
+    f.write(np.asarray(wav, dtype='<f4').tobytes())
+
+
+def read_records(path):
+    r"""Read (item_id, tokens, wav) records of a shard sequentially"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_HEADER.itemsize)
+            if not header:
+                break
+            header = np.frombuffer(header, dtype=_HEADER)[0]
+            item_id = f.read(int(header['id_len'])).decode('utf-8')
+            tokens = np.frombuffer(f.read(4 * int(header['text_len'])),
+                                   dtype='<i4')
+            wav = np.frombuffer(f.read(4 * int(header['wav_len'])),
+                                dtype='<f4')
+            yield item_id, tokens, wav
+
+
+def _load_record(args):
+    item_id, wav_path, text, cleaners, sample_rate, ap, quality = args
+    wav = load_wav(wav_path, sample_rate, quality)
+    frames = (0, 0)
+    if ap is not None:
+        wav, num_frames, removed = ap.trim_for_training(wav)
+        frames = (num_frames, removed)
+    return (item_id, text_to_sequence(text, cleaners), wav), frames
+
+
+def build_shards(items, root_path, sample_rate, cleaners,
+                 items_per_shard=2000, num_workers=1, ap=None,
+                 resample_quality='medium'):
+    r"""Write items into sequential shard files of resampled audio and
+    tokenized text.
+
+    Args:
+        items: list of (item_id, wav_path, text) tuples.
+        root_path: output folder.
+        sample_rate: target sample rate.
+        cleaners: list of text cleaner names.
+        items_per_shard: number of items per shard file.
+        num_workers: number of processes loading and resampling files.
+        ap: AudioProcessor trimming silence (if its ```trim_db``` is set).
+        resample_quality: see ```resample```.
+    """
+    os.makedirs(root_path, exist_ok=True)
+    print(" > Writing {} items into shards of {} at {}".format(
+        len(items), items_per_shard, root_path))
+    jobs = [(item_id, wav_path, text, cleaners, sample_rate, ap,
+             resample_quality)
+            for item_id, wav_path, text in items]
+    shards = []
+    trimmed = [0, 0]
+    f = None
+    # no more processes than chunks of jobs, none for a single one
+    num_workers = min(num_workers, -(-len(jobs) // 16))
+    pool = Pool(num_workers) if num_workers > 1 else None
+    records = pool.imap(_load_record, jobs, chunksize=16) \
+        if pool is not None else map(_load_record, jobs)
+    try:
+        for i, (record, frames) in enumerate(records):
+            if i % items_per_shard == 0:
+                if f is not None:
+                    f.close()
+                name = 'shard_{:05d}.bin'.format(len(shards))
+                shards.append({'path': name, 'num_items': 0})
+                f = open(os.path.join(root_path, name), 'wb')
+            write_record(f, *record)
+            shards[-1]['num_items'] += 1
+            trimmed[0] += frames[0]
+            trimmed[1] += frames[1]
+    finally:
+        if f is not None:
+            f.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    meta = {'sample_rate': sample_rate, 'cleaners': cleaners,
+            'shards': shards}
+    with open(os.path.join(root_path, 'shards.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(" | > {} shards".format(len(shards)))
+    if ap is not None and ap.trim_db is not None:
+        report_trimmed(*trimmed)
+
+
+class StreamingDataset(IterableDataset):
+    r"""Stream instances from sequential shard files written by
+    ```build_shards```, for corpora that do not fit in memory.
+
+    Each epoch the shard order is shuffled with a seed shared by all
+    processes, shards are split across processes (```rank```,
+    ```world_size```) and then across DataLoader workers, and every worker
+    reads its shards front to back. Instances pass through a bounded
+    shuffle buffer, so memory use depends on ```buffer_size``` and not on
+    the corpus size. Batches have the same layout as LJSpeechDataset.
+    """
+
+    def __init__(self, root_path, outputs_per_step, sample_rate, text_cleaner,
+                 num_mels, min_level_db, frame_shift_ms, frame_length_ms,
+                 preemphasis, ref_level_db, num_freq, power, buffer_size=1000,
+                 rank=0, world_size=1, seed=0, return_wavs=False,
+                 stft_backend='librosa'):
+        with open(os.path.join(root_path, 'shards.json'), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta['sample_rate'] != sample_rate:
+            raise ValueError(" !! Shards at {} are sampled at {} Hz, expected"
+                             " {} Hz".format(root_path,
+                                             self.meta['sample_rate'],
+                                             sample_rate))
+        if self.meta['cleaners'] != [text_cleaner]:
+            raise ValueError(" !! Shards at {} are tokenized with {}".format(
+                root_path, self.meta['cleaners']))
+        self.root_path = root_path
+        self.outputs_per_step = outputs_per_step
+        self.buffer_size = buffer_size
+        self.rank = rank
+        self.world_size = world_size
+        self.seed = seed
+        self.return_wavs = return_wavs
+        self.epoch = 0
+        self.ap = AudioProcessor(sample_rate, num_mels, min_level_db,
+                                 frame_shift_ms, frame_length_ms, preemphasis,
+                                 ref_level_db, num_freq, power,
+                                 stft_backend=stft_backend)
+        # shared by forked loader workers
+        self.ap.warm_cache()
+        print(" > Streaming shards from - {}".format(root_path))
+        print(" | > Number of shards : {}".format(len(self.meta['shards'])))
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _rank_shards(self):
+        shards = self.meta['shards']
+        rng = np.random.RandomState(self.seed + self.epoch)
+        order = rng.permutation(len(shards))
+        return [shards[i] for i in order[self.rank::self.world_size]]
+
+    def __len__(self):
+        return sum(shard['num_items'] for shard in self._rank_shards())
+
+    def _records(self, shards):
+        for shard in shards:
+            path = os.path.join(self.root_path, shard['path'])
+            for record in read_records(path):
+                yield record
+
+    def __iter__(self):
+        shards = self._rank_shards()
+        worker_info = get_worker_info()
+        worker_id = 0
+        if worker_info is not None:
+            shards = shards[worker_info.id::worker_info.num_workers]
+            worker_id = worker_info.id
+        rng = np.random.RandomState(
+            [self.seed, self.epoch, self.rank, worker_id])
+        buffer = []
+        for record in self._records(shards):
+            if len(buffer) < self.buffer_size:
+                buffer.append(record)
+                continue
+            idx = rng.randint(len(buffer))
+            record, buffer[idx] = buffer[idx], record
+            yield self._to_sample(record)
+        rng.shuffle(buffer)
+        for record in buffer:
+            yield self._to_sample(record)
+
+    def _to_sample(self, record):
+        item_id, tokens, wav = record
+        return {'text': tokens, 'wav': wav, 'item_idx': item_id}
+
+    # batches have the same layout as LJSpeechDataset
+    collate_fn = LJSpeechDataset.collate_fn
@@ -22,7 +22,11 @@ class Tacotron(nn.Module):
         self.postnet = CBHG(mel_dim, K=8, projections=[256, mel_dim])
         self.last_linear = nn.Linear(mel_dim * 2, linear_dim)
 
-    def forward(self, characters, mel_specs=None):
+    def forward(self, characters, mel_specs=None, postnet=True):
+        r"""With ```postnet``` False the postnet and the linear projection
+        are skipped and None is returned for the linear spectrograms, e.g.
+        to vocode mel outputs with AudioProcessor.mel_to_linear at lower
+        latency."""
         B = characters.size(0)
         inputs = self.embedding(characters)
         # batch x time x dim
@@ -33,6 +37,8 @@ class Tacotron(nn.Module):
         # Reshape
         # batch x time x dim
         mel_outputs = mel_outputs.view(B, -1, self.mel_dim)
+        if not postnet:
+            return mel_outputs, None, alignments
         linear_outputs = self.postnet(mel_outputs)
         linear_outputs = self.last_linear(linear_outputs)
         return mel_outputs, linear_outputs, alignments
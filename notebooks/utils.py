@@ -8,7 +8,7 @@ from matplotlib import pylab as plt
 hop_length = 250
 
 
-def create_speech(m, s, CONFIG, use_cuda, ap):
+def create_speech(m, s, CONFIG, use_cuda, ap, use_postnet=True):
     text_cleaner = [CONFIG.text_cleaner]
     seq = np.array(text_to_sequence(s, text_cleaner))
 
@@ -23,8 +23,13 @@ def create_speech(m, s, CONFIG, use_cuda, ap):
             torch.from_numpy(seq), volatile=True).unsqueeze(0)
 #         mel_var = torch.autograd.Variable(torch.from_numpy(mel).type(torch.FloatTensor), volatile=True)
 
-    mel_out, linear_out, alignments = m.forward(chars_var)
-    linear_out = linear_out[0].data.cpu().numpy()
+    mel_out, linear_out, alignments = m.forward(chars_var,
+                                                postnet=use_postnet)
+    if use_postnet:
+        linear_out = linear_out[0].data.cpu().numpy()
+    else:
+        # vocode the decoder mel outputs, faster on CPU
+        linear_out = ap.mel_to_linear(mel_out[0].data.cpu().numpy().T).T
     alignment = alignments[0].cpu().data.numpy()
     spec = ap._denormalize(linear_out)
     wav = ap.inv_spectrogram(linear_out.T)
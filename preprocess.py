@@ -0,0 +1,86 @@
+import os
+import argparse
+from multiprocessing import cpu_count
+
+from utils.generic_utils import load_config
+from utils.audio import AudioProcessor
+from utils.feature_store import build_feature_store, DTYPES
+from utils.packed_audio import build_packed_audio
+from utils.duration_index import build_duration_index
+from utils.resample import resample_files
+from datasets.streaming import build_shards
+
+
+def main(args):
+    c = load_config(args.config_path)
+    with open(os.path.join(c.data_path, args.meta_file), "r") as f:
+        frames = [line.split('|') for line in f]
+    items = [(ins[0], os.path.join(c.data_path, 'wavs', ins[0] + '.wav'))
+             for ins in frames]
+    # trims silence of training audio if trim_db is set
+    ap = AudioProcessor(c.sample_rate, c.num_mels, c.min_level_db,
+                        c.frame_shift_ms, c.frame_length_ms, c.preemphasis,
+                        c.ref_level_db, c.num_freq, c.power,
+                        trim_db=c.trim_db, trim_margin_ms=c.trim_margin_ms,
+                        stft_backend=c.stft_backend)
+
+    if args.mode == 'features':
+        out_path = args.out_path if args.out_path else c.feature_path
+        build_feature_store(items, out_path, ap, args.num_workers,
+                            args.feature_dtype, c.resample_quality,
+                            args.rebuild)
+    elif args.mode == 'audio':
+        out_path = args.out_path if args.out_path else c.packed_audio_path
+        build_packed_audio(items, out_path, c.sample_rate, args.audio_dtype,
+                           args.num_workers, ap, c.resample_quality,
+                           args.rebuild)
+    elif args.mode == 'durations':
+        out_path = args.out_path if args.out_path else c.duration_index_path
+        build_duration_index(items, out_path, c.sample_rate, args.num_workers)
+    elif args.mode == 'shards':
+        out_path = args.out_path if args.out_path else c.shard_path
+        items = [item + (ins[1],) for item, ins in zip(items, frames)]
+        build_shards(items, out_path, c.sample_rate, [c.text_cleaner],
+                     args.items_per_shard, args.num_workers, ap,
+                     c.resample_quality)
+    elif args.mode == 'resample':
+        # a copy of the wav files at the sample rate of the config
+        if not args.out_path:
+            raise ValueError(" !! --out_path is required to resample")
+        resample_files(items, args.out_path, c.sample_rate,
+                       c.resample_quality, args.num_workers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_path', type=str,
+                        help='path to config file for training',)
+    parser.add_argument('--mode', type=str, default='features',
+                        choices=['features', 'audio', 'durations', 'shards',
+                                 'resample'],
+                        help='compute a feature store, pack resampled audio, '
+                        'index durations from wav headers, write streaming '
+                        'shards or write resampled wav files')
+    parser.add_argument('--out_path', type=str, default=None,
+                        help='output path, defaults to feature_path, '
+                        'packed_audio_path, duration_index_path or shard_path '
+                        'in the config')
+    parser.add_argument('--meta_file', type=str, default='metadata.csv',
+                        help='metadata file under data_path listing the '
+                        'instances to process')
+    parser.add_argument('--feature_dtype', type=str, default='float32',
+                        choices=DTYPES,
+                        help='storage format of features, integer formats '
+                        'are quantized over the normalized range')
+    parser.add_argument('--audio_dtype', type=str, default='float32',
+                        choices=['float32', 'int16'],
+                        help='sample format of packed audio')
+    parser.add_argument('--items_per_shard', type=int, default=2000,
+                        help='number of instances per streaming shard')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='rebuild features or packed audio from scratch '
+                        'instead of updating new and changed items')
+    parser.add_argument('--num_workers', type=int, default=cpu_count(),
+                        help='number of processes')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,144 @@
+import unittest
+import numpy as np
+
+from TTS.tests.common import c, make_ap, dummy_wav
+
+
+class TestAudio(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestAudio, self).__init__(*args, **kwargs)
+        self.ap = make_ap(griffin_lim_iters=c.griffin_lim_iters)
+
+    def test_linear_and_mel_spectrogram(self):
+        wav = dummy_wav(c.sample_rate)
+        linear, mel = self.ap.linear_and_mel_spectrogram(wav)
+        assert np.allclose(linear, self.ap.spectrogram(wav))
+        assert np.allclose(mel, self.ap.melspectrogram(wav))
+
+    def test_batch_linear_and_mel_spectrogram(self):
+        wavs = [dummy_wav(n) for n in [8000, 20000, 13000]]
+        linears, mels = self.ap.batch_linear_and_mel_spectrogram(wavs)
+        for wav, linear, mel in zip(wavs, linears, mels):
+            single_linear, single_mel = self.ap.linear_and_mel_spectrogram(wav)
+            assert linear.shape == single_linear.shape
+            assert mel.shape == single_mel.shape
+            assert np.allclose(linear, single_linear)
+            assert np.allclose(mel, single_mel)
+
+    def test_cache(self):
+        ap = make_ap(num_mels=c.num_mels // 2)
+        self.ap.warm_cache()
+        # processors with different parameters do not share filterbanks
+        assert self.ap._get_mel_basis().shape[0] == c.num_mels
+        assert ap._get_mel_basis().shape[0] == c.num_mels // 2
+        wav = dummy_wav(c.sample_rate)
+        assert ap.melspectrogram(wav).shape[0] == c.num_mels // 2
+        assert self.ap.melspectrogram(wav).shape[0] == c.num_mels
+        # and the same parameters reuse the same arrays
+        same = make_ap()
+        assert same._get_mel_basis() is self.ap._get_mel_basis()
+        assert same._get_window() is self.ap._get_window()
+        assert not same._get_mel_basis().flags.writeable
+        assert same._get_mel_basis_pinv().shape == (c.num_freq, c.num_mels)
+
+    def test_find_endpoint(self):
+        def find_endpoint(wav, threshold_db=-40, min_silence_sec=0.8):
+            # reference loop
+            window_length = int(c.sample_rate * min_silence_sec)
+            hop_length = int(window_length / 4)
+            threshold = self.ap._db_to_amp(threshold_db)
+            for x in range(hop_length, len(wav) - window_length, hop_length):
+                if np.max(wav[x:x + window_length]) < threshold:
+                    return x + hop_length
+            return len(wav)
+        for _ in range(20):
+            wav = dummy_wav(np.random.randint(100, 3 * c.sample_rate))
+            wav[np.random.randint(len(wav)):] *= 1e-3
+            for sec in [0.1, 0.8]:
+                assert self.ap.find_endpoint(wav, min_silence_sec=sec) == \
+                    find_endpoint(wav, min_silence_sec=sec)
+
+    def test_trim_silence(self):
+        speech = dummy_wav(c.sample_rate)
+        silence = 1e-4 * np.random.randn(c.sample_rate // 2)
+        wav = np.concatenate([silence, speech, silence]).astype(np.float32)
+        ap = make_ap(trim_db=40, trim_margin_ms=10)
+        start, end = ap.trim_range(wav)
+        win_length = ap._stft_parameters()[2]
+        margin = int(0.01 * c.sample_rate)
+        assert abs(start - (len(silence) - margin)) <= win_length
+        assert abs(end - (len(silence) + len(speech) + margin)) <= win_length
+        trimmed, num_frames, removed = ap.trim_for_training(wav)
+        assert np.array_equal(trimmed, wav[start:end])
+        assert num_frames == ap.num_frames(len(wav))
+        assert removed == num_frames - ap.num_frames(len(trimmed))
+        # nothing is trimmed without trim_db
+        assert self.ap.trim_for_training(wav)[2] == 0
+
+    def test_dtype(self):
+        ap64 = make_ap(griffin_lim_iters=10, dtype='float64')
+        ap32 = make_ap(griffin_lim_iters=10)
+        wav = dummy_wav(c.sample_rate)
+        assert ap32.apply_preemphasis(wav).dtype == np.float32
+        assert ap32._stft(wav).dtype == np.complex64
+        assert ap64._stft(wav).dtype == np.complex128
+        linear32, mel32 = ap32.linear_and_mel_spectrogram(wav)
+        linear64, mel64 = ap64.linear_and_mel_spectrogram(wav)
+        assert linear32.dtype == mel32.dtype == np.float32
+        assert linear64.dtype == mel64.dtype == np.float64
+        # normalized features are within 0.1 dB of the float64 path
+        assert np.abs(linear32 - linear64).max() < 1e-3
+        assert np.abs(mel32 - mel64).max() < 1e-3
+        # and so is Griffin-Lim from the same initial phases
+        np.random.seed(0)
+        wav32 = ap32.inv_spectrogram(linear64)
+        np.random.seed(0)
+        wav64 = ap64.inv_spectrogram(linear64)
+        assert wav32.dtype == np.float32
+        assert np.abs(wav32 - wav64).max() < 1e-3 * np.abs(wav64).max()
+
+    def test_stft_backends(self):
+        wavs = [dummy_wav(n) for n in [8000, 20000, 13000]]
+        D = self.ap._stft(wavs[0])
+        linears, mels = self.ap.batch_linear_and_mel_spectrogram(wavs)
+        for backend in ['numpy', 'torch']:
+            ap = make_ap(stft_backend=backend)
+            D_backend = ap._stft(wavs[0])
+            assert D_backend.shape == D.shape
+            assert D_backend.dtype == np.complex64
+            assert np.allclose(D_backend, D, atol=1e-3)
+            assert np.allclose(ap._istft(D), self.ap._istft(D), atol=1e-4)
+            assert np.allclose(ap.spectrogram(wavs[0]),
+                               self.ap.spectrogram(wavs[0]), atol=1e-4)
+            # batches go through a single STFT of the zero padded waveforms
+            batch_linears, batch_mels = \
+                ap.batch_linear_and_mel_spectrogram(wavs)
+            for linear, mel, batch_linear, batch_mel in zip(
+                    linears, mels, batch_linears, batch_mels):
+                assert batch_linear.shape == linear.shape
+                assert batch_mel.shape == mel.shape
+                assert np.allclose(batch_linear, linear, atol=1e-4)
+                assert np.allclose(batch_mel, mel, atol=1e-4)
+        with self.assertRaises(ValueError):
+            make_ap(stft_backend='scipy')
+
+    def test_mel_to_linear(self):
+        wav = dummy_wav(c.sample_rate)
+        linear, mel = self.ap.linear_and_mel_spectrogram(wav)
+
+        def to_mel(linear):
+            S = self.ap._db_to_amp(self.ap._denormalize(linear) +
+                                   self.ap.ref_level_db)
+            S = self.ap._amp_to_db(self.ap._linear_to_mel(S))
+            S -= self.ap.ref_level_db
+            return self.ap._normalize(S)
+        mel_errors = []
+        for method in ['pinv', 'nnls']:
+            linear_hat = self.ap.mel_to_linear(mel, method)
+            assert linear_hat.shape == linear.shape
+            assert np.abs(linear_hat - linear).mean() < 0.1
+            # the mel spectrogram of the estimate is close to the input
+            mel_errors.append(np.abs(to_mel(linear_hat) - mel).mean())
+        assert mel_errors[0] < 0.02
+        assert mel_errors[1] < mel_errors[0] / 4
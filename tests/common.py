@@ -0,0 +1,58 @@
+r"""Fixtures shared by the test modules"""
+import os
+import numpy as np
+from scipy.io import wavfile
+
+from TTS.utils.generic_utils import load_config
+from TTS.utils.audio import AudioProcessor
+
+
+file_path = os.path.dirname(os.path.realpath(__file__))
+c = load_config(os.path.join(file_path, 'test_config.json'))
+
+
+def make_ap(**overrides):
+    r"""AudioProcessor with the audio parameters of test_config.json. Any
+    of them, and the optional arguments of AudioProcessor, can be given to
+    override them."""
+    params = {'sample_rate': c.sample_rate, 'num_mels': c.num_mels,
+              'min_level_db': c.min_level_db,
+              'frame_shift_ms': c.frame_shift_ms,
+              'frame_length_ms': c.frame_length_ms,
+              'preemphasis': c.preemphasis, 'ref_level_db': c.ref_level_db,
+              'num_freq': c.num_freq, 'power': c.power}
+    params.update(overrides)
+    return AudioProcessor(**params)
+
+
+def dummy_wav(num_samples, sample_rate=c.sample_rate):
+    r"""Amplitude modulated tone with a little noise, as float32"""
+    t = np.arange(num_samples) / sample_rate
+    wav = 0.5 * np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t)
+    wav += 0.01 * np.random.randn(num_samples)
+    return wav.astype(np.float32)
+
+
+def write_wavs(root_path, lengths, sample_rate=c.sample_rate, first_id=0):
+    r"""Write float32 wav files of noise with the given numbers of samples
+    as LJ-<i>.wav into ```root_path```. ```sample_rate``` is a rate for all
+    files or a list of rates per file. Returns (item_id, path) tuples."""
+    if not isinstance(sample_rate, (list, tuple)):
+        sample_rate = [sample_rate] * len(lengths)
+    items = []
+    for i, (length, sr) in enumerate(zip(lengths, sample_rate), first_id):
+        item_id = 'LJ-{}'.format(i)
+        path = os.path.join(root_path, item_id + '.wav')
+        wavfile.write(path, sr,
+                      (0.1 * np.random.randn(length)).astype(np.float32))
+        items.append((item_id, path))
+    return items
+
+
+def write_unreadable(root_path, item_id):
+    r"""Write a file that is not a wav as ```item_id```.wav. Returns its
+    (item_id, path) tuple."""
+    path = os.path.join(root_path, item_id + '.wav')
+    with open(path, 'wb') as f:
+        f.write(b'not a wav file')
+    return item_id, path
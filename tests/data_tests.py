@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+
+from TTS.utils.data import (prepare_data, prepare_tensor,
+                            prepare_time_major_tensor, prepare_stop_target)
+
+
+class PrepareTensorTests(unittest.TestCase):
+
+    def test_time_major(self):
+        inputs = [np.random.rand(80, l).astype('float32') for l in [7, 12, 3]]
+        out = prepare_time_major_tensor([x.T for x in inputs], 5)
+        assert out.dtype == np.float32
+        assert out.shape == (3, 15, 80)
+        assert np.array_equal(out, prepare_tensor(inputs, 5).transpose(0, 2, 1))
+        for i, x in enumerate(inputs):
+            assert np.array_equal(out[i, :x.shape[1]], x.T)
+            assert out[i, x.shape[1]:].sum() == 0
+
+    def test_stop_target(self):
+        inputs = [np.zeros(l, dtype=np.float32) for l in [7, 12, 3]]
+        out = prepare_stop_target(inputs, 5)
+        assert out.shape == (3, 15)
+        assert out.dtype == np.float32
+        assert list(out.sum(1)) == [8, 3, 12]
+
+    def test_data(self):
+        inputs = [np.arange(1, l + 1, dtype=np.int32) for l in [4, 2]]
+        out = prepare_data(inputs)
+        assert out.dtype == np.int32
+        assert out.tolist() == [[1, 2, 3, 4], [1, 2, 0, 0]]
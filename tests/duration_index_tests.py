@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from TTS.tests.common import c, make_ap, write_wavs
+from TTS.utils.resample import load_wav
+from TTS.utils.duration_index import build_duration_index, DurationIndex
+
+
+class DurationIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.items = write_wavs(self.root_path, [22050, 11025, 30001, 7000],
+                                [22050, 22050, 44100, 16000])
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def test_frames(self):
+        ap = make_ap()
+        index_path = os.path.join(self.root_path, 'durations.npz')
+        build_duration_index(self.items, index_path, c.sample_rate)
+        index = DurationIndex(index_path)
+        index.check_sample_rate(c.sample_rate)
+        self.assertRaises(ValueError, index.check_sample_rate, 16000)
+        assert len(index) == len(self.items)
+        for item_id, path in self.items:
+            wav = load_wav(path, c.sample_rate)
+            assert index.get_length(item_id) == len(wav)
+            num_frames = ap.num_frames(index.get_length(item_id))
+            assert num_frames == ap.melspectrogram(wav).shape[1]
+        assert 'LJ-9' not in index
+        self.assertRaises(KeyError, index.get_length, 'LJ-9')
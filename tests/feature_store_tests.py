@@ -0,0 +1,138 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from TTS.tests.common import c, make_ap, write_wavs, write_unreadable
+from TTS.utils.resample import load_wav
+from TTS.utils.feature_store import (FeatureStoreWriter, FeatureStore,
+                                     dequantize, build_feature_store)
+
+
+class FeatureStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.ap = make_ap()
+        self.items = {}
+        self.errors = self._write_store(self.root_path, 'float32')
+
+    def _write_store(self, root_path, dtype):
+        os.makedirs(root_path, exist_ok=True)
+        ids, shards, offsets, lengths = [], [], [], []
+        errors = []
+        for shard_id in range(2):
+            writer = FeatureStoreWriter(root_path, shard_id,
+                                        c.num_freq, c.num_mels, dtype)
+            for i in range(3):
+                item_id = 'LJ{}-{}'.format(shard_id, i)
+                length = np.random.randint(5, 20)
+                if item_id not in self.items:
+                    self.items[item_id] = (np.random.rand(c.num_freq, length),
+                                           np.random.rand(c.num_mels, length))
+                writer.add(item_id, *self.items[item_id])
+            index = writer.close()
+            errors.append(index['errors'])
+            ids += index['ids']
+            shards += index['shards']
+            offsets += index['offsets']
+            lengths += index['lengths']
+        np.savez(os.path.join(root_path, 'index.npz'), ids=np.array(ids),
+                 shards=np.array(shards), offsets=np.array(offsets),
+                 lengths=np.array(lengths))
+        meta = {'audio_params': self.ap.feature_params(), 'dtype': dtype,
+                'linear_dim': c.num_freq, 'mel_dim': c.num_mels,
+                'num_shards': 2}
+        with open(os.path.join(root_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return errors
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def test_load(self):
+        store = FeatureStore(self.root_path)
+        assert len(store) == len(self.items)
+        for item_id, (linear, mel) in self.items.items():
+            assert item_id in store
+            store_linear, store_mel = store.load(item_id)
+            assert store_linear.shape == linear.T.shape
+            assert store_mel.shape == mel.T.shape
+            assert store.get_length(item_id) == linear.shape[1]
+            assert np.allclose(store_linear, linear.T)
+            assert np.allclose(store_mel, mel.T)
+
+    def test_check_params(self):
+        store = FeatureStore(self.root_path)
+        store.check_params(self.ap)
+        self.ap.num_mels = c.num_mels * 2
+        self.assertRaises(ValueError, store.check_params, self.ap)
+
+    def test_quantized(self):
+        for dtype, atol in [('float16', 5e-4), ('uint16', 1e-5),
+                            ('uint8', 2e-3)]:
+            root_path = os.path.join(self.root_path, dtype)
+            errors = self._write_store(root_path, dtype)
+            store = FeatureStore(root_path)
+            for item_id, (linear, mel) in self.items.items():
+                store_linear, store_mel = store.load(item_id)
+                assert store_linear.dtype == np.float32
+                assert np.allclose(store_linear, linear.T, atol=atol)
+                assert np.allclose(store_mel, mel.T, atol=atol)
+                # raw values dequantize to the same features
+                raw_linear, _ = store.load(item_id, raw=True)
+                assert raw_linear.dtype == np.dtype(dtype)
+                assert np.array_equal(dequantize(raw_linear), store_linear)
+            # errors reported by the writer bound the actual ones
+            for shard_errors in errors:
+                max_error, _, count = shard_errors['linear']
+                assert 0 < max_error <= atol and count > 0
+
+    def test_incremental_build(self):
+        items = write_wavs(self.root_path, [8000, 12000])
+        out_path = os.path.join(self.root_path, 'built')
+        store = build_feature_store(items, out_path, self.ap)
+        assert store.meta['num_shards'] == 1
+        items += write_wavs(self.root_path, [4000], first_id=2)
+        items.append(write_unreadable(self.root_path, 'LJ-3'))
+        store = build_feature_store(items, out_path, self.ap)
+        # the new item lands in a new shard, the old ones are kept
+        assert store.meta['num_shards'] == 2
+        assert len(store) == 3
+        assert store.shards[store.find(['LJ-2'])[0]] == 1
+        assert store.failed_ids == ['LJ-3']
+        linear, mel = store.load('LJ-2')
+        wav = load_wav(items[2][1], c.sample_rate)
+        assert np.allclose(mel, self.ap.melspectrogram(wav).T, atol=1e-5)
+        store = build_feature_store(items, out_path, self.ap)
+        assert store.meta['num_shards'] == 2
+
+    def test_compaction(self):
+        items = write_wavs(self.root_path, [8000, 12000])
+        out_path = os.path.join(self.root_path, 'built')
+        build_feature_store(items, out_path, self.ap)
+        shard_path = os.path.join(out_path, 'mel_00000.bin')
+        size = os.path.getsize(shard_path)
+        # stale frames of the changed item are kept below the ratio ...
+        write_wavs(self.root_path, [6000], first_id=0)
+        store = build_feature_store(items, out_path, self.ap,
+                                    compact_ratio=0.5)
+        assert store.meta['num_shards'] == 2
+        assert os.path.getsize(shard_path) == size
+        # ... and dropped above it
+        write_wavs(self.root_path, [2000, 4000])
+        store = build_feature_store(items, out_path, self.ap)
+        assert store.meta['num_shards'] == 1
+        assert sorted(os.listdir(out_path)) == [
+            'build.json', 'index.npz', 'linear_00000.bin', 'mel_00000.bin',
+            'meta.json']
+        assert os.path.getsize(shard_path) == \
+            4 * c.num_mels * store.lengths.sum()
+        for item_id, path in items:
+            linear, mel = store.load(item_id)
+            wav = load_wav(path, c.sample_rate)
+            assert np.allclose(mel, self.ap.melspectrogram(wav).T, atol=1e-5)
+        store = build_feature_store(items, out_path, self.ap, rebuild=True)
+        assert store.meta['num_shards'] == 1
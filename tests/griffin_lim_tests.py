@@ -0,0 +1,134 @@
+import unittest
+import numpy as np
+import torch
+
+from TTS.tests.common import make_ap, dummy_wav
+from TTS.utils.griffin_lim import (NumpySTFT, TorchSTFT, batch_griffin_lim,
+                                   stream_griffin_lim)
+
+
+def _spectral_convergence(ap, wav, S):
+    S_hat = np.abs(ap._stft(wav.astype(np.float32)))[:, :S.shape[1]]
+    return np.linalg.norm(S_hat - S) / np.linalg.norm(S)
+
+
+class TestGriffinLim(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestGriffinLim, self).__init__(*args, **kwargs)
+        self.ap = make_ap(griffin_lim_iters=30)
+        self.n_fft, self.hop_length, self.win_length = \
+            self.ap._stft_parameters()
+
+    def _backends(self):
+        return [backend(self.n_fft, self.hop_length, self.win_length,
+                        self.ap._get_window())
+                for backend in [NumpySTFT, TorchSTFT]]
+
+    def test_stft(self):
+        wavs = np.stack([dummy_wav(8000) for _ in range(2)])
+        for stft in self._backends():
+            D = stft.to_numpy(stft.stft(stft.to_array(wavs)))
+            for wav, d in zip(wavs, D):
+                assert np.allclose(d, self.ap._stft(wav), atol=1e-3)
+
+    def test_istft(self):
+        wav = dummy_wav(8000)
+        D = self.ap._stft(wav)
+        num_frames = D.shape[1]
+        # a short utterance padded in a batch matches the one alone
+        padded = np.zeros((2, D.shape[0], num_frames), dtype=D.dtype)
+        padded[0] = D
+        padded[1, :, :num_frames - 10] = D[:, :num_frames - 10]
+        alone = self.ap._istft(D[:, :num_frames - 10])
+        for stft in self._backends():
+            window_sums = stft.window_sums([num_frames, num_frames - 10],
+                                           num_frames)
+            D_batch = torch.from_numpy(padded) if \
+                isinstance(stft, TorchSTFT) else padded
+            y = stft.to_numpy(stft.istft(D_batch, window_sums))
+            assert np.allclose(y[0], self.ap._istft(D), atol=1e-4)
+            assert np.allclose(y[1, :len(alone)], alone, atol=1e-4)
+
+    def test_batch_inv_spectrogram(self):
+        specs = [self.ap.spectrogram(dummy_wav(n))
+                 for n in [6000, 11000]]
+        lengths = [s.shape[1] for s in specs]
+        batch = np.zeros((2, specs[0].shape[0], max(lengths)),
+                         dtype=np.float32)
+        for i, s in enumerate(specs):
+            batch[i, :, :s.shape[1]] = s
+        for backend in ['numpy', 'torch']:
+            outputs = self.ap.batch_inv_spectrogram(batch, lengths, backend)
+            for spec, out in zip(specs, outputs):
+                assert len(out) == (spec.shape[1] - 1) * self.hop_length
+                S = self.ap._db_to_amp(self.ap._denormalize(spec) +
+                                       self.ap.ref_level_db) ** self.ap.power
+                error = _spectral_convergence(
+                    self.ap, self.ap.apply_preemphasis(out), S)
+                assert error < 0.3, error
+        # by default the configured STFT backend runs, numpy for librosa
+        for stft_backend, backend in [('librosa', 'numpy'),
+                                      ('torch', 'torch')]:
+            ap = make_ap(griffin_lim_iters=1, stft_backend=stft_backend)
+            ap.batch_inv_spectrogram(batch, lengths)
+            assert list(ap._stfts) == [backend]
+
+    def test_fast_inv_spectrogram(self):
+        spec = self.ap.spectrogram(dummy_wav(11000))
+        np.random.seed(0)
+        wav, info = self.ap.fast_inv_spectrogram(spec, momentum=0.)
+        assert info['iters'] == self.ap.griffin_lim_iters
+        assert len(wav) == (spec.shape[1] - 1) * self.hop_length
+        np.random.seed(0)
+        fast_wav, fast_info = self.ap.fast_inv_spectrogram(spec)
+        assert fast_info['convergence'] < info['convergence']
+        # the reported convergence is the one of the returned waveform
+        S = self.ap._db_to_amp(self.ap._denormalize(spec) +
+                               self.ap.ref_level_db) ** self.ap.power
+        for out, out_info in [(wav, info), (fast_wav, fast_info)]:
+            error = _spectral_convergence(
+                self.ap, self.ap.apply_preemphasis(out), S)
+            assert abs(error - out_info['convergence']) < 1e-3, error
+        # also after a few iterations, where iterates still differ a lot
+        stft = NumpySTFT(self.n_fft, self.hop_length, self.win_length,
+                         self.ap._get_window())
+        for num_iters in [0, 1, 3]:
+            wavs, out_info = batch_griffin_lim(S[None], [S.shape[1]], stft,
+                                               num_iters, 0.99)
+            error = _spectral_convergence(self.ap, wavs[0], S)
+            assert abs(error - out_info['convergence'][0]) < 1e-4, error
+        # early stopping
+        np.random.seed(0)
+        _, info = self.ap.fast_inv_spectrogram(
+            spec, tol=fast_info['convergence'] * 1.2)
+        assert info['iters'] < self.ap.griffin_lim_iters
+        assert info['convergence'] < fast_info['convergence'] * 1.2
+        _, info = self.ap.fast_inv_spectrogram(spec, time_budget=0,
+                                               backend='torch')
+        assert info['iters'] == 1
+
+    def test_stream_inv_spectrogram(self):
+        spec = self.ap.spectrogram(dummy_wav(22050))
+        bounds = [0, 7, 30, 31, 60, spec.shape[1]]
+        chunks = [spec[:, a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        np.random.seed(0)
+        segments = list(self.ap.stream_inv_spectrogram(
+            chunks, chunk_frames=20, context_frames=4))
+        assert len(segments) > 1
+        wav = np.concatenate(segments)
+        assert len(wav) == (spec.shape[1] - 1) * self.hop_length
+        S = self.ap._db_to_amp(self.ap._denormalize(spec) +
+                               self.ap.ref_level_db) ** self.ap.power
+        error = _spectral_convergence(self.ap,
+                                      self.ap.apply_preemphasis(wav), S)
+        assert error < 0.4, error
+        # inverse preemphasis runs across segments as on the whole signal
+        np.random.seed(0)
+        stft = NumpySTFT(self.n_fft, self.hop_length, self.win_length,
+                         self.ap._get_window())
+        magnitudes = [S[:, a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        raw = np.concatenate(list(stream_griffin_lim(
+            magnitudes, stft, 20, 4, self.ap.griffin_lim_iters, 0.99)))
+        assert np.allclose(self.ap.apply_inv_preemphasis(raw), wav,
+                           atol=1e-4)
@@ -1,14 +1,15 @@
 import os
+import shutil
+import tempfile
 import unittest
 import numpy as np
 
 from torch.utils.data import DataLoader
-from TTS.utils.generic_utils import load_config
-from TTS.datasets.LJSpeech import LJSpeechDataset
-
-
-file_path = os.path.dirname(os.path.realpath(__file__))
-c = load_config(os.path.join(file_path, 'test_config.json'))
+from TTS.tests.common import c, write_wavs, write_unreadable
+from TTS.datasets.LJSpeech import LJSpeechDataset, tokenize_all
+from TTS.datasets.manifest import Manifest
+from TTS.utils.duration_index import build_duration_index
+from TTS.utils.text import text_to_sequence
 
 
 class TestDataset(unittest.TestCase):
@@ -141,3 +142,115 @@ class TestDataset(unittest.TestCase):
             # check batch conditions
             assert (mel_input * stop_target.unsqueeze(2)).sum() == 0
             assert (linear_input * stop_target.unsqueeze(2)).sum() == 0
+
+
+class TestTokenizedText(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.texts = ['Hello world.', 'Mr. Smith paid $12 on Jan 3rd.',
+                      'The quick brown fox.']
+        with open(os.path.join(self.root_path, 'metadata.csv'), 'w') as f:
+            for i, text in enumerate(self.texts):
+                f.write('LJ-{}|{}|{}\n'.format(i, text, text))
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def _dataset(self, **kwargs):
+        return LJSpeechDataset(os.path.join(self.root_path, 'metadata.csv'),
+                               self.root_path,
+                               c.r,
+                               c.sample_rate,
+                               c.text_cleaner,
+                               c.num_mels,
+                               c.min_level_db,
+                               c.frame_shift_ms,
+                               c.frame_length_ms,
+                               c.preemphasis,
+                               c.ref_level_db,
+                               c.num_freq,
+                               c.power,
+                               **kwargs
+                               )
+
+    def test_tokens(self):
+        dataset = self._dataset()
+        assert len(dataset.token_offsets) == len(dataset) + 1
+        texts = [dataset.manifest.get_text(i) for i in range(len(dataset))]
+        assert sorted(texts) == sorted(self.texts)
+        for idx, text in enumerate(texts):
+            seq = text_to_sequence(text, [c.text_cleaner])
+            start = dataset.token_offsets[idx]
+            end = dataset.token_offsets[idx + 1]
+            assert dataset.tokens[start:end].tolist() == seq
+        assert dataset.get_text_lengths().tolist() == \
+            [len(text_to_sequence(text, [c.text_cleaner])) for text in texts]
+
+    def test_tokenize_all(self):
+        # enough texts for two processes, the same ids as in one
+        texts = self.texts * 1400
+        serial = tokenize_all(texts, [c.text_cleaner])
+        parallel = tokenize_all(texts, [c.text_cleaner], num_workers=2)
+        for a, b in zip(serial, parallel):
+            assert np.array_equal(a, b)
+
+    def test_min_seq_len(self):
+        dataset = self._dataset(min_seq_len=13)
+        assert len(dataset) == 2
+        lengths = dataset.manifest.text_lengths
+        assert (lengths >= 13).all() and (np.diff(lengths) >= 0).all()
+
+    def test_index(self):
+        index_path = os.path.join(self.root_path, 'index.npz')
+        dataset = self._dataset(index_path=index_path)
+        assert os.path.exists(index_path)
+        cached = self._dataset(index_path=index_path)
+        assert cached.manifest.ids.tolist() == dataset.manifest.ids.tolist()
+        assert np.array_equal(cached.tokens, dataset.tokens)
+        assert np.array_equal(cached.token_offsets, dataset.token_offsets)
+        # a different filter invalidates the index
+        filtered = self._dataset(index_path=index_path, min_seq_len=13)
+        assert len(filtered) == 2
+
+    def test_unreadable_wav(self):
+        dataset = self._dataset()
+        write_unreadable(self.root_path, 'LJ-0')
+        idx = dataset.manifest.ids.tolist().index('LJ-0')
+        with self.assertRaisesRegex(RuntimeError, 'LJ-0.wav'):
+            dataset[idx]
+
+    def test_audio_frames(self):
+        items = write_wavs(self.root_path, [int(length * c.sample_rate)
+                                            for length in [2.0, 0.5, 1.0]])
+        index_path = os.path.join(self.root_path, 'durations.npz')
+        build_duration_index(items, index_path, c.sample_rate)
+        dataset = self._dataset(duration_index_path=index_path)
+        lengths = dataset.get_frame_lengths()
+        for idx in range(len(dataset)):
+            wav = dataset[idx]['wav']
+            assert lengths[idx] == dataset.ap.spectrogram(wav).shape[1]
+        hop_length = dataset.ap._stft_parameters()[1]
+        max_frames = int(1.5 * c.sample_rate) // hop_length
+        filtered = self._dataset(duration_index_path=index_path,
+                                 min_audio_frames=max_frames // 2,
+                                 max_audio_frames=max_frames)
+        assert [filtered.manifest.get_id(i) for i in range(len(filtered))] \
+            == ['LJ-2']
+        assert filtered[0]['text'].tolist() == text_to_sequence(
+            self.texts[2], [c.text_cleaner])
+
+
+class TestManifest(unittest.TestCase):
+
+    def test_subset(self):
+        texts = ['a', 'Bcd', u'été', '', 'xyz!']
+        manifest = Manifest.from_texts(['id{}'.format(i)
+                                        for i in range(len(texts))], texts)
+        assert [manifest.get_text(i) for i in range(5)] == texts
+        sub = manifest.subset([4, 2, 0])
+        assert len(sub) == 3
+        assert [sub.get_id(i) for i in range(3)] == ['id4', 'id2', 'id0']
+        assert [sub.get_text(i) for i in range(3)] == ['xyz!', u'été',
+                                                      'a']
+        assert sub.text_lengths.tolist() == [4, 3, 1]
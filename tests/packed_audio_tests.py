@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+from TTS.tests.common import make_ap, write_wavs, write_unreadable
+from TTS.utils.packed_audio import build_packed_audio, PackedAudio
+
+
+class PackedAudioTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.items = write_wavs(self.root_path, [22050, 11025, 30000],
+                                22050)
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def _check(self, dtype):
+        out_path = os.path.join(self.root_path, 'packed_' + dtype)
+        build_packed_audio(self.items, out_path, 20000, dtype=dtype)
+        packed = PackedAudio(out_path)
+        packed.check_sample_rate(20000)
+        self.assertRaises(ValueError, packed.check_sample_rate, 22050)
+        assert len(packed) == len(self.items)
+        for item_id, path in self.items:
+            wav = packed.load(item_id)
+            assert wav.dtype == np.float32
+            sr, orig = wavfile.read(path)
+            assert abs(len(wav) - len(orig) * 20000 / sr) <= 1
+            assert packed.get_length(item_id) == len(wav)
+        return packed
+
+    def test_float32(self):
+        packed = self._check('float32')
+        # float32 corpora are read without a copy
+        wav = packed.load(self.items[0][0])
+        assert not wav.flags['OWNDATA']
+
+    def test_int16(self):
+        packed = self._check('int16')
+        reference = self._check('float32')
+        for item_id, _ in self.items:
+            assert np.allclose(packed.load(item_id), reference.load(item_id),
+                               atol=1. / 32768)
+
+    def test_incremental(self):
+        out_path = os.path.join(self.root_path, 'packed')
+        build_packed_audio(self.items, out_path, 22050)
+        audio_path = os.path.join(out_path, 'audio.bin')
+        size = os.path.getsize(audio_path)
+        # a new, a changed and an unreadable file
+        items = self.items + write_wavs(self.root_path, [1000], 22050,
+                                        first_id=3)
+        write_wavs(self.root_path, [500], 22050, first_id=1)
+        items.append(write_unreadable(self.root_path, 'LJ-bad'))
+        packed = build_packed_audio(items, out_path, 22050)
+        # only the new and the changed items are appended
+        assert os.path.getsize(audio_path) == size + 4 * 1500
+        assert len(packed) == len(self.items) + 1
+        assert packed.get_length('LJ-1') == 500
+        assert packed.get_length('LJ-3') == 1000
+        assert packed.failed_ids == ['LJ-bad']
+        # nothing left to do
+        build_packed_audio(items, out_path, 22050)
+        assert os.path.getsize(audio_path) == size + 4 * 1500
+        # other parameters rebuild everything
+        packed = build_packed_audio(items, out_path, 22050, dtype='int16')
+        assert os.path.getsize(audio_path) == 2 * (packed.lengths.sum())
+
+    def test_trim_silence(self):
+        ap = make_ap(sample_rate=22050, trim_db=40)
+        wav = np.zeros(30000, dtype=np.float32)
+        wav[10000:20000] = 0.1 * np.random.randn(10000)
+        path = os.path.join(self.root_path, 'LJ-silence.wav')
+        wavfile.write(path, 22050, wav)
+        out_path = os.path.join(self.root_path, 'packed')
+        packed = build_packed_audio([('LJ-silence', path)], out_path, 22050,
+                                    ap=ap)
+        assert packed.get_length('LJ-silence') < 12000
+        # other trimming parameters rebuild the corpus
+        packed = build_packed_audio([('LJ-silence', path)], out_path, 22050)
+        assert packed.get_length('LJ-silence') == 30000
@@ -0,0 +1,35 @@
+import unittest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from TTS.utils.prefetcher import BatchPrefetcher
+
+
+class BatchPrefetcherTests(unittest.TestCase):
+
+    def test_batches(self):
+        dataset = TensorDataset(torch.arange(50).float(), torch.arange(50))
+        loader = DataLoader(dataset, batch_size=8)
+        prefetcher = BatchPrefetcher(loader, use_cuda=False)
+        assert len(prefetcher) == len(loader)
+        assert prefetcher.dataset is dataset
+        for expected, batch in zip(loader, prefetcher):
+            assert all(torch.equal(x, y) for x, y in zip(expected, batch))
+        assert len(list(prefetcher)) == len(loader)
+        assert prefetcher.wait_time >= 0
+
+    def test_early_stop(self):
+        loader = DataLoader(TensorDataset(torch.arange(100)), batch_size=1)
+        prefetcher = BatchPrefetcher(loader, use_cuda=False, num_prefetch=1)
+        for i, batch in enumerate(prefetcher):
+            if i == 3:
+                break
+        assert len(list(prefetcher)) == 100
+
+    def test_error(self):
+        def collate(batch):
+            raise RuntimeError("broken batch")
+        loader = DataLoader(TensorDataset(torch.arange(4)), batch_size=2,
+                            collate_fn=collate)
+        prefetcher = BatchPrefetcher(loader, use_cuda=False)
+        self.assertRaises(RuntimeError, list, prefetcher)
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+from TTS.tests.common import write_unreadable
+from TTS.utils.resample import (QUALITIES, get_filter, resample, load_wav,
+                                resample_files)
+
+
+def _tone(freq, sample_rate, num_samples):
+    t = np.arange(num_samples) / float(sample_rate)
+    return 0.5 * np.sin(2 * np.pi * freq * t)
+
+
+class ResampleTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def test_resample(self):
+        wav = _tone(1000, 22050, 22050).astype(np.float32)
+        expected = _tone(1000, 20000, 20000)
+        errors = []
+        for quality in ['fast', 'medium', 'high']:
+            out = resample(wav, 22050, 20000, quality)
+            assert out.dtype == np.float32
+            assert len(out) == 20000
+            errors.append(np.abs(out - expected)[100:-100].max())
+        # the passband is accurate at all qualities, more so at higher ones
+        assert errors[0] < 1e-2
+        assert errors[2] < errors[0]
+        # frequencies above the target Nyquist frequency are removed
+        alias = resample(_tone(11000, 22050, 22050), 22050, 20000)
+        assert np.abs(alias[100:-100]).max() < 1e-3
+        assert resample(wav, 22050, 22050) is wav
+
+    def test_filter_cache(self):
+        h = get_filter(44100, 16000, 'fast')
+        assert get_filter(44100, 16000, 'fast') is h
+        assert get_filter(44100, 16000, 'high') is not h
+        assert len(get_filter(44100, 16000, 'high')) > len(h)
+        assert not h.flags.writeable
+        self.assertRaises(ValueError, get_filter, 44100, 16000, 'best')
+        assert sorted(QUALITIES) == ['fast', 'high', 'medium']
+
+    def test_files(self):
+        items = []
+        for i, length in enumerate([22050, 11025]):
+            path = os.path.join(self.root_path, 'LJ-{}.wav'.format(i))
+            wav = np.stack([_tone(440, 22050, length)] * 2, axis=1)
+            wavfile.write(path, 22050, wav.astype(np.float32))
+            items.append(('LJ-{}'.format(i), path))
+        items.append(write_unreadable(self.root_path, 'LJ-2'))
+        # stereo files are mixed down
+        wav = load_wav(items[0][1], 16000)
+        assert wav.shape == (16000,)
+        out_path = os.path.join(self.root_path, 'resampled')
+        failed = resample_files(items, out_path, 16000)
+        assert list(failed) == ['LJ-2']
+        sample_rate, out = wavfile.read(os.path.join(out_path, 'LJ-1.wav'))
+        assert sample_rate == 16000
+        assert out.dtype == np.int16
+        assert len(out) == 8000
+        assert np.abs(out / 32768. - load_wav(items[1][1], 16000)).max() < 1e-4
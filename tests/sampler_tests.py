@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+
+from TTS.datasets.samplers import (BucketBatchSampler, FrameBudgetBatchSampler,
+                                  padding_efficiency)
+
+
+class BucketBatchSamplerTests(unittest.TestCase):
+
+    def test_batches(self):
+        lengths = np.random.randint(10, 500, size=103)
+        sampler = BucketBatchSampler(lengths, 8, 20)
+        batches = list(sampler)
+        assert len(batches) == len(sampler)
+        idxs = sorted(sum(batches, []))
+        assert idxs == list(range(len(lengths)))
+        assert max(len(b) for b in batches) == 8
+
+    def test_drop_last(self):
+        lengths = np.random.randint(10, 500, size=103)
+        sampler = BucketBatchSampler(lengths, 8, 20, drop_last=True)
+        batches = list(sampler)
+        assert len(batches) == len(sampler) == 103 // 8
+        assert all(len(b) == 8 for b in batches)
+
+    def test_shuffle(self):
+        lengths = np.random.randint(10, 500, size=256)
+        sampler = BucketBatchSampler(lengths, 8, 20)
+        assert list(sampler) != list(sampler)
+
+    def test_padding_efficiency(self):
+        lengths = np.random.randint(10, 500, size=256)
+        sampler = BucketBatchSampler(lengths, 8, 20)
+        list(sampler)
+        batches = [np.arange(i, i + 8) for i in range(0, 256, 8)]
+        assert sampler.padding_efficiency > padding_efficiency(batches,
+                                                               lengths)
+
+
+class FrameBudgetBatchSamplerTests(unittest.TestCase):
+
+    def test_budget(self):
+        lengths = np.random.randint(10, 500, size=300)
+        text_lengths = np.random.randint(5, 100, size=300)
+        sampler = FrameBudgetBatchSampler(lengths, 2000, 20,
+                                          text_lengths=text_lengths,
+                                          max_tokens=800, outputs_per_step=5)
+        num_batches = len(sampler)
+        batches = list(sampler)
+        assert len(batches) == num_batches
+        idxs = sorted(sum(batches, []))
+        assert idxs == list(range(len(lengths)))
+        for batch in batches:
+            max_len = np.ceil((lengths[batch].max() + 1) / 5) * 5
+            assert max_len * len(batch) <= 2000 or len(batch) == 1
+            assert text_lengths[batch].max() * len(batch) <= 800 \
+                or len(batch) == 1
+
+    def test_short_batches_are_larger(self):
+        lengths = np.concatenate([np.full(100, 20), np.full(100, 400)])
+        sampler = FrameBudgetBatchSampler(lengths, 2000, 20)
+        sizes = {int(lengths[b[0]]): len(b) for b in sampler}
+        assert sizes[20] > sizes[400]
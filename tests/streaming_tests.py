@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from torch.utils.data import DataLoader
+
+from TTS.tests.common import c, write_wavs
+from TTS.datasets.streaming import build_shards, StreamingDataset
+
+
+class StreamingDatasetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.shard_path = os.path.join(self.root_path, 'shards')
+        items = [(item_id, path, 'Text number {}.'.format(i))
+                 for i, (item_id, path) in enumerate(write_wavs(
+                     self.root_path, [2000 + 100 * i for i in range(23)]))]
+        build_shards(items, self.shard_path, c.sample_rate, [c.text_cleaner],
+                     items_per_shard=5)
+        self.ids = set(item[0] for item in items)
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def _dataset(self, **kwargs):
+        return StreamingDataset(self.shard_path, c.r, c.sample_rate,
+                                c.text_cleaner, c.num_mels, c.min_level_db,
+                                c.frame_shift_ms, c.frame_length_ms,
+                                c.preemphasis, c.ref_level_db, c.num_freq,
+                                c.power, **kwargs)
+
+    def test_epoch(self):
+        dataset = self._dataset(buffer_size=4)
+        assert len(dataset) == len(self.ids)
+        ids = [sample['item_idx'] for sample in dataset]
+        assert sorted(ids) == sorted(self.ids)
+        dataset.set_epoch(1)
+        assert [sample['item_idx'] for sample in dataset] != ids
+
+    def test_workers(self):
+        dataset = self._dataset(buffer_size=4)
+        loader = DataLoader(dataset, batch_size=None, num_workers=2)
+        ids = [sample['item_idx'] for sample in loader]
+        assert sorted(ids) == sorted(self.ids)
+
+    def test_ranks(self):
+        ids = []
+        for rank in range(2):
+            dataset = self._dataset(rank=rank, world_size=2)
+            rank_ids = [sample['item_idx'] for sample in dataset]
+            assert len(rank_ids) == len(dataset)
+            ids += rank_ids
+        assert sorted(ids) == sorted(self.ids)
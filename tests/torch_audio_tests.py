@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+import torch
+
+from TTS.tests.common import c, make_ap, dummy_wav
+from TTS.utils.data import prepare_time_major_tensor, prepare_stop_target
+from TTS.utils.torch_audio import TorchAudioProcessor
+
+
+class TestTorchAudio(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestTorchAudio, self).__init__(*args, **kwargs)
+        self.ap = make_ap()
+        self.torch_ap = TorchAudioProcessor(self.ap)
+
+    def test_features(self):
+        wav = dummy_wav(c.sample_rate)
+        linear, mel = self.torch_ap(torch.from_numpy(wav).unsqueeze(0))
+        ref_linear, ref_mel = self.ap.linear_and_mel_spectrogram(wav)
+        assert linear.shape[1:] == ref_linear.shape
+        assert mel.shape[1:] == ref_mel.shape
+        assert np.allclose(linear[0].numpy(), ref_linear, atol=1e-4)
+        assert np.allclose(mel[0].numpy(), ref_mel, atol=1e-4)
+
+    def test_batch_targets(self):
+        r = 5
+        lengths = [8000, 20000, 13000]
+        wavs = [dummy_wav(n) for n in lengths]
+        padded = np.zeros((len(wavs), max(lengths)), dtype=np.float32)
+        for i, wav in enumerate(wavs):
+            padded[i, :len(wav)] = wav
+        linear, mel, mel_lengths, stop_targets = self.torch_ap.batch_targets(
+            torch.from_numpy(padded), torch.LongTensor(lengths), r)
+        # same layout as LJSpeechDataset.collate_fn
+        ref_linear, ref_mel = self.ap.batch_linear_and_mel_spectrogram(wavs)
+        ref_mel_list = [x.T for x in ref_mel]
+        ref_linear = prepare_time_major_tensor([x.T for x in ref_linear], r)
+        ref_mel = prepare_time_major_tensor(ref_mel_list, r)
+        ref_stop = prepare_stop_target(
+            [np.zeros(x.shape[0], dtype=np.float32) for x in ref_mel_list], r)
+        assert linear.shape == ref_linear.shape
+        assert mel.shape == ref_mel.shape
+        assert stop_targets.shape == ref_stop.shape
+        assert np.array_equal(stop_targets.numpy(), ref_stop)
+        assert mel_lengths.tolist() == [
+            n // self.torch_ap.hop_length + 2 for n in lengths]
+        # all frames match, including the last ones of padded items
+        for i, n in enumerate(mel_lengths.tolist()):
+            assert (linear[i, n - 1:] == 0).all()
+            assert (mel[i, n - 1:] == 0).all()
+            assert np.allclose(linear[i].numpy(), ref_linear[i], atol=1e-4)
+            assert np.allclose(mel[i].numpy(), ref_mel[i], atol=1e-4)
@@ -0,0 +1,82 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+from TTS.utils.wav_writer import WavWriter
+
+
+class _Pipe(io.RawIOBase):
+    r"""Unseekable output collecting what is written"""
+
+    def __init__(self):
+        self.data = b''
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += bytes(b)
+        return len(b)
+
+
+def _chunks(wav, size):
+    return [wav[i:i + size] for i in range(0, len(wav), size)]
+
+
+class WavWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.wav = (0.3 * np.random.randn(20000)).astype(np.float32)
+
+    def test_peak(self):
+        expected = (self.wav * (32767 / np.abs(self.wav).max())).astype(
+            np.int16)
+        copy = self.wav.copy()
+        for peak in [None, np.abs(self.wav).max()]:
+            out = io.BytesIO()
+            with WavWriter(out, 22050, peak=peak, block_size=1000) as writer:
+                for chunk in _chunks(self.wav, 3333):
+                    writer.write(chunk)
+            sample_rate, wav = wavfile.read(io.BytesIO(out.getvalue()))
+            assert sample_rate == 22050
+            assert np.array_equal(wav, expected)
+        # the input is left as it was
+        assert np.array_equal(self.wav, copy)
+
+    def test_path_and_pipe(self):
+        root_path = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root_path, 'out.wav')
+            with WavWriter(path, 16000, gain=None) as writer:
+                writer.write(self.wav)
+            wav = wavfile.read(path)[1]
+            assert len(wav) == len(self.wav)
+            assert np.array_equal(wav, (np.clip(self.wav, -1, 1) *
+                                        32767).astype(np.int16))
+        finally:
+            shutil.rmtree(root_path)
+        pipe = _Pipe()
+        with WavWriter(pipe, 16000, gain=None) as writer:
+            for chunk in _chunks(self.wav, 5000):
+                writer.write(chunk)
+        assert pipe.data[4:8] == b'\xff\xff\xff\xff'
+        assert len(pipe.data) == 44 + 2 * len(self.wav)
+
+    def test_limiter(self):
+        wav = np.concatenate([0.01 * self.wav, 3 * self.wav, 0.1 * self.wav])
+        out = io.BytesIO()
+        with WavWriter(out, 22050, gain='limiter', block_size=512) as writer:
+            for chunk in _chunks(wav, 1024):
+                writer.write(chunk)
+        pcm = wavfile.read(io.BytesIO(out.getvalue()))[1]
+        assert len(pcm) == len(wav)
+        # loud passages are attenuated so that only the peak of a block
+        # reaches full scale, nothing is clipped ...
+        num_blocks = -(-len(wav) // 512)
+        assert (np.abs(pcm) >= 32766).sum() <= num_blocks
+        # ... and quiet ones get their level back
+        assert np.abs(pcm[-5000:]).max() > 16000
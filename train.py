@@ -24,12 +24,17 @@ from utils.generic_utils import (Progbar, remove_experiment_folder,
                                  count_parameters, check_update)
 from utils.model import get_param_size
 from utils.visual import plot_alignment, plot_spectrogram
+from utils.prefetcher import BatchPrefetcher
+from utils.torch_audio import TorchAudioProcessor
 from datasets.LJSpeech import LJSpeechDataset
+from datasets.streaming import StreamingDataset
+from datasets.samplers import BucketBatchSampler, FrameBudgetBatchSampler
 from models.tacotron import Tacotron
 from layers.losses import L1LossMasked
 
 
 use_cuda = torch.cuda.is_available()
+device_ap = None
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--restore_path', type=str,
@@ -64,14 +69,24 @@ def signal_handler(signal, frame):
     sys.exit(1)
 
 
-def train(model, criterion, data_loader, optimizer, epoch):
+def get_targets(data):
+    r"""Spectrogram targets of a batch, computed here on the training
+    device if the loader returns raw waveforms"""
+    if device_ap is None:
+        return data[2], data[3], data[4]
+    linear, mel, mel_lengths, _ = device_ap.batch_targets(data[2], data[3],
+                                                          c.r)
+    return linear, mel, mel_lengths
+
+
+def train(model, criterion, data_loader, optimizer, epoch, last_step):
     model = model.train()
     epoch_time = 0
     avg_linear_loss = 0
     avg_mel_loss = 0
 
     print(" | > Epoch {}/{}".format(epoch, c.epochs))
-    progbar = Progbar(len(data_loader.dataset) / c.batch_size)
+    progbar = Progbar(len(data_loader))
     n_priority_freq = int(3000 / (c.sample_rate * 0.5) * c.num_freq)
     for num_iter, data in enumerate(data_loader):
         start_time = time.time()
@@ -79,12 +94,9 @@ def train(model, criterion, data_loader, optimizer, epoch):
         # setup input data
         text_input = data[0]
         text_lengths = data[1]
-        linear_input = data[2]
-        mel_input = data[3]
-        mel_lengths = data[4]
+        linear_input, mel_input, mel_lengths = get_targets(data)
 
-        current_step = num_iter + args.restore_step + \
-            epoch * len(data_loader) + 1
+        current_step = last_step + num_iter + 1
 
         # setup lr
         current_lr = lr_decay(c.lr, current_step, c.warmup_steps)
@@ -93,19 +105,13 @@ def train(model, criterion, data_loader, optimizer, epoch):
 
         optimizer.zero_grad()
 
-        # convert inputs to variables
+        # convert inputs to variables, BatchPrefetcher has already moved
+        # them to the GPU
         text_input_var = Variable(text_input)
         mel_spec_var = Variable(mel_input)
         mel_lengths_var = Variable(mel_lengths)
         linear_spec_var = Variable(linear_input, volatile=True)
 
-        # dispatch data to GPU
-        if use_cuda:
-            text_input_var = text_input_var.cuda()
-            mel_spec_var = mel_spec_var.cuda()
-            mel_lengths_var = mel_lengths_var.cuda()
-            linear_spec_var = linear_spec_var.cuda()
-
         # forward pass
         mel_output, linear_output, alignments =\
             model.forward(text_input_var, mel_spec_var)
@@ -146,6 +152,8 @@ def train(model, criterion, data_loader, optimizer, epoch):
                       current_step)
         tb.add_scalar('Params/GradNorm', grad_norm, current_step)
         tb.add_scalar('Time/StepTime', step_time, current_step)
+        tb.add_scalar('Time/DataWaitTime', data_loader.last_wait_time,
+                      current_step)
 
         if current_step % c.save_step == 0:
             if c.checkpoint:
@@ -169,8 +177,10 @@ def train(model, criterion, data_loader, optimizer, epoch):
             # Sample audio
             audio_signal = linear_output[0].data.cpu().numpy()
             data_loader.dataset.ap.griffin_lim_iters = 60
-            audio_signal = data_loader.dataset.ap.inv_spectrogram(
-                audio_signal.T)
+            audio_signal = data_loader.dataset.ap.batch_inv_spectrogram(
+                audio_signal.T[None], [audio_signal.shape[0]])[0]
+            audio_signal = audio_signal[:data_loader.dataset.ap.find_endpoint(
+                audio_signal)]
             try:
                 tb.add_audio('SampleAudio', audio_signal, current_step,
                              sample_rate=c.sample_rate)
@@ -190,6 +200,14 @@ def train(model, criterion, data_loader, optimizer, epoch):
                   linear_loss.data[0], current_step)
     tb.add_scalar('TrainEpochLoss/MelLoss', mel_loss.data[0], current_step)
     tb.add_scalar('Time/EpochTime', epoch_time, epoch)
+    tb.add_scalar('Time/EpochDataWaitTime', data_loader.wait_time, epoch)
+    if getattr(data_loader.batch_sampler, 'padding_efficiency', None):
+        # transcript lengths only approximate the padding of frames
+        tag = 'Data/PaddingEfficiency' \
+            if data_loader.batch_sampler.length_unit == 'frames' \
+            else 'Data/TextPaddingEfficiency'
+        tb.add_scalar(tag, data_loader.batch_sampler.padding_efficiency,
+                      epoch)
     epoch_time = 0
 
     return avg_linear_loss, current_step
@@ -201,7 +219,7 @@ def evaluate(model, criterion, data_loader, current_step):
 
     print(" | > Validation")
     n_priority_freq = int(3000 / (c.sample_rate * 0.5) * c.num_freq)
-    progbar = Progbar(len(data_loader.dataset) / c.eval_batch_size)
+    progbar = Progbar(len(data_loader))
 
     avg_linear_loss = 0
     avg_mel_loss = 0
@@ -212,23 +230,15 @@ def evaluate(model, criterion, data_loader, current_step):
         # setup input data
         text_input = data[0]
         text_lengths = data[1]
-        linear_input = data[2]
-        mel_input = data[3]
-        mel_lengths = data[4]
+        linear_input, mel_input, mel_lengths = get_targets(data)
 
-        # convert inputs to variables
+        # convert inputs to variables, BatchPrefetcher has already moved
+        # them to the GPU
         text_input_var = Variable(text_input)
         mel_spec_var = Variable(mel_input)
         mel_lengths_var = Variable(mel_lengths)
         linear_spec_var = Variable(linear_input, volatile=True)
 
-        # dispatch data to GPU
-        if use_cuda:
-            text_input_var = text_input_var.cuda()
-            mel_spec_var = mel_spec_var.cuda()
-            mel_lengths_var = mel_lengths_var.cuda()
-            linear_spec_var = linear_spec_var.cuda()
-
         # forward pass
         mel_output, linear_output, alignments = model.forward(
             text_input_var, mel_spec_var)
@@ -270,7 +280,10 @@ def evaluate(model, criterion, data_loader, current_step):
     # Sample audio
     audio_signal = linear_output[idx].data.cpu().numpy()
     data_loader.dataset.ap.griffin_lim_iters = 60
-    audio_signal = data_loader.dataset.ap.inv_spectrogram(audio_signal.T)
+    audio_signal = data_loader.dataset.ap.batch_inv_spectrogram(
+        audio_signal.T[None], [audio_signal.shape[0]])[0]
+    audio_signal = audio_signal[:data_loader.dataset.ap.find_endpoint(
+        audio_signal)]
     try:
         tb.add_audio('ValSampleAudio', audio_signal, current_step,
                      sample_rate=c.sample_rate)
@@ -292,29 +305,102 @@ def evaluate(model, criterion, data_loader, current_step):
     return avg_linear_loss
 
 
+def _index_path(name):
+    if c.index_dir is None:
+        return None
+    return os.path.join(c.index_dir, name + '.npz')
+
+
 def main(args):
 
     # Setup the dataset
-    train_dataset = LJSpeechDataset(os.path.join(c.data_path, 'metadata_train.csv'),
-                                    os.path.join(c.data_path, 'wavs'),
-                                    c.r,
-                                    c.sample_rate,
-                                    c.text_cleaner,
-                                    c.num_mels,
-                                    c.min_level_db,
-                                    c.frame_shift_ms,
-                                    c.frame_length_ms,
-                                    c.preemphasis,
-                                    c.ref_level_db,
-                                    c.num_freq,
-                                    c.power,
-                                    min_seq_len=c.min_seq_len
-                                    )
-
-    train_loader = DataLoader(train_dataset, batch_size=c.batch_size,
-                              shuffle=False, collate_fn=train_dataset.collate_fn,
-                              drop_last=False, num_workers=c.num_loader_workers,
-                              pin_memory=True)
+    if c.shard_path is not None:
+        # shards are read sequentially, without lengths to sample or filter
+        ignored = [name for name in ['max_batch_frames', 'min_audio_frames',
+                                     'max_audio_frames',
+                                     'duration_index_path']
+                   if c[name]]
+        assert not ignored, \
+            " !! {} cannot be used with shard_path".format(', '.join(ignored))
+        if c.bucket_width > 0:
+            print(" !! bucket_width is ignored with shard_path, batches are"
+                  " drawn from the shuffle buffer")
+        train_dataset = StreamingDataset(c.shard_path,
+                                         c.r,
+                                         c.sample_rate,
+                                         c.text_cleaner,
+                                         c.num_mels,
+                                         c.min_level_db,
+                                         c.frame_shift_ms,
+                                         c.frame_length_ms,
+                                         c.preemphasis,
+                                         c.ref_level_db,
+                                         c.num_freq,
+                                         c.power,
+                                         buffer_size=c.shuffle_buffer_size,
+                                         return_wavs=c.device_features,
+                                         stft_backend=c.stft_backend
+                                         )
+        train_loader = DataLoader(train_dataset, batch_size=c.batch_size,
+                                  collate_fn=train_dataset.collate_fn,
+                                  drop_last=False, num_workers=c.num_loader_workers,
+                                  pin_memory=True)
+    else:
+        train_dataset = LJSpeechDataset(os.path.join(c.data_path, 'metadata_train.csv'),
+                                        os.path.join(c.data_path, 'wavs'),
+                                        c.r,
+                                        c.sample_rate,
+                                        c.text_cleaner,
+                                        c.num_mels,
+                                        c.min_level_db,
+                                        c.frame_shift_ms,
+                                        c.frame_length_ms,
+                                        c.preemphasis,
+                                        c.ref_level_db,
+                                        c.num_freq,
+                                        c.power,
+                                        min_seq_len=c.min_seq_len,
+                                        feature_path=c.feature_path,
+                                        packed_audio_path=c.packed_audio_path,
+                                        index_path=_index_path('metadata_train'),
+                                        duration_index_path=c.duration_index_path,
+                                        min_audio_frames=c.min_audio_frames,
+                                        max_audio_frames=c.max_audio_frames if c.max_audio_frames > 0 else None,
+                                        return_wavs=c.device_features,
+                                        resample_quality=c.resample_quality,
+                                        stft_backend=c.stft_backend,
+                                        tokenize_workers=c.num_loader_workers
+                                        )
+
+        if c.max_batch_frames > 0:
+            assert train_dataset.audio_frames is not None, \
+                " !! max_batch_frames needs decoder frame lengths from a" \
+                " duration index, packed audio or a feature store"
+            train_sampler = FrameBudgetBatchSampler(
+                train_dataset.get_frame_lengths(), c.max_batch_frames,
+                max(1, c.bucket_width),
+                text_lengths=train_dataset.get_text_lengths(),
+                max_tokens=c.max_batch_tokens if c.max_batch_tokens > 0 else None,
+                outputs_per_step=c.r)
+            train_loader = DataLoader(train_dataset, batch_sampler=train_sampler,
+                                      collate_fn=train_dataset.collate_fn,
+                                      num_workers=c.num_loader_workers,
+                                      pin_memory=True)
+        elif c.bucket_width > 0:
+            train_sampler = BucketBatchSampler(
+                train_dataset.get_frame_lengths(), c.batch_size,
+                c.bucket_width,
+                length_unit='frames' if train_dataset.audio_frames is not None
+                else 'text')
+            train_loader = DataLoader(train_dataset, batch_sampler=train_sampler,
+                                      collate_fn=train_dataset.collate_fn,
+                                      num_workers=c.num_loader_workers,
+                                      pin_memory=True)
+        else:
+            train_loader = DataLoader(train_dataset, batch_size=c.batch_size,
+                                      shuffle=False, collate_fn=train_dataset.collate_fn,
+                                      drop_last=False, num_workers=c.num_loader_workers,
+                                      pin_memory=True)
 
     val_dataset = LJSpeechDataset(os.path.join(c.data_path, 'metadata_val.csv'),
                                   os.path.join(c.data_path, 'wavs'),
@@ -328,7 +414,14 @@ def main(args):
                                   c.preemphasis,
                                   c.ref_level_db,
                                   c.num_freq,
-                                  c.power
+                                  c.power,
+                                  feature_path=c.feature_path,
+                                  packed_audio_path=c.packed_audio_path,
+                                  index_path=_index_path('metadata_val'),
+                                  return_wavs=c.device_features,
+                                  resample_quality=c.resample_quality,
+                                  stft_backend=c.stft_backend,
+                                  tokenize_workers=c.num_loader_workers
                                   )
 
     val_loader = DataLoader(val_dataset, batch_size=c.eval_batch_size,
@@ -336,6 +429,17 @@ def main(args):
                             drop_last=False, num_workers=4,
                             pin_memory=True)
 
+    # compute spectrogram targets on the training device
+    global device_ap
+    if c.device_features:
+        device_ap = TorchAudioProcessor(train_dataset.ap)
+        if use_cuda:
+            device_ap = device_ap.cuda()
+
+    # stage upcoming batches on the device while the model is computing
+    train_loader = BatchPrefetcher(train_loader, use_cuda)
+    val_loader = BatchPrefetcher(val_loader, use_cuda)
+
     model = Tacotron(c.embedding_size,
                      c.num_freq,
                      c.num_mels,
@@ -373,9 +477,12 @@ def main(args):
     if 'best_loss' not in locals():
         best_loss = float('inf')
 
+    current_step = args.restore_step
     for epoch in range(0, c.epochs):
+        if hasattr(train_loader.dataset, 'set_epoch'):
+            train_loader.dataset.set_epoch(epoch)
         train_loss, current_step = train(
-            model, criterion, train_loader, optimizer, epoch)
+            model, criterion, train_loader, optimizer, epoch, current_step)
         val_loss = evaluate(model, criterion, val_loader, current_step)
         best_loss = save_best_model(model, optimizer, val_loss,
                                     best_loss, OUT_PATH,
@@ -4,14 +4,34 @@ import pickle
 import numpy as np
 from scipy import signal
 
-_mel_basis = None
+from TTS.utils.griffin_lim import (BACKENDS, batch_griffin_lim,
+                                   stream_griffin_lim)
+from TTS.utils.wav_writer import WavWriter
+
+# filterbanks, pseudo-inverses and windows shared by all processors of a
+# process, keyed by kind, (sample_rate, n_fft, num_mels, hop, win) and dtype.
+# Entries are read-only, so warming the cache before loader workers fork
+# leaves a single copy shared by all of them.
+_cache = {}
 
 
 class AudioProcessor(object):
+    r"""Audio analysis and synthesis.
+
+    Waveforms, spectrograms and Griffin-Lim run in ```dtype``` (float32 by
+    default, with complex64 STFTs), float64 gives the former double
+    precision path.
+
+    STFTs go through ```stft_backend```: 'librosa', 'numpy' (numpy FFTs
+    over strided frames) or 'torch' (torch.stft on CPU). The numpy and
+    torch backends reuse their padded window and inverse normalization
+    across calls and transform a whole batch of waveforms at once.
+    """
 
     def __init__(self, sample_rate, num_mels, min_level_db, frame_shift_ms,
                  frame_length_ms, preemphasis, ref_level_db, num_freq, power,
-                 griffin_lim_iters=None):
+                 griffin_lim_iters=None, trim_db=None, trim_margin_ms=0,
+                 dtype='float32', stft_backend='librosa'):
         self.sample_rate = sample_rate
         self.num_mels = num_mels
         self.min_level_db = min_level_db
@@ -22,26 +42,104 @@ class AudioProcessor(object):
         self.num_freq = num_freq
         self.power = power
         self.griffin_lim_iters = griffin_lim_iters
+        self.trim_db = trim_db
+        self.trim_margin_ms = trim_margin_ms
+        self.dtype = np.dtype(dtype)
+        assert self.dtype in (np.float32, np.float64), dtype
+        self.complex_dtype = np.result_type(self.dtype, np.complex64)
+        if stft_backend != 'librosa' and stft_backend not in BACKENDS:
+            raise ValueError(" !! Unknown STFT backend {}".format(
+                stft_backend))
+        self.stft_backend = stft_backend
+        self._stfts = {}
+
+    def feature_params(self):
+        r"""Parameters that define the computed spectrograms"""
+        return {'sample_rate': self.sample_rate,
+                'num_mels': self.num_mels,
+                'min_level_db': self.min_level_db,
+                'frame_shift_ms': self.frame_shift_ms,
+                'frame_length_ms': self.frame_length_ms,
+                'preemphasis': self.preemphasis,
+                'ref_level_db': self.ref_level_db,
+                'num_freq': self.num_freq}
+
+    def trim_params(self):
+        r"""Parameters of silence trimming at preprocessing time"""
+        return {'trim_db': self.trim_db,
+                'trim_margin_ms': self.trim_margin_ms}
+
+    def trim_for_training(self, wav):
+        r"""Trim a training waveform if ```trim_db``` is set. Returns the
+        waveform and the number of decoder frames it had and lost."""
+        num_frames = self.num_frames(len(wav))
+        if self.trim_db is None:
+            return wav, num_frames, 0
+        wav = self.trim_silence(wav)
+        return wav, num_frames, num_frames - self.num_frames(len(wav))
 
     def save_wav(self, wav, path):
-        wav *= 32767 / max(0.01, np.max(np.abs(wav)))
-        librosa.output.write_wav(path, wav.astype(np.int16), self.sample_rate)
+        r"""Write a waveform scaled to its peak as 16 bit PCM to a path or
+        a binary file object, without modifying ```wav```"""
+        with self.wav_writer(path, peak=np.max(np.abs(wav))) as writer:
+            writer.write(wav)
+
+    def wav_writer(self, f, gain='peak', peak=None, block_size=8192):
+        r"""WavWriter at the sampling rate of this processor, to write
+        waveform chunks as they are synthesized, e.g. the segments of
+        ```stream_inv_spectrogram``` with ```gain='limiter'```"""
+        return WavWriter(f, self.sample_rate, gain, peak, block_size)
+
+    def _cached(self, kind, build_fn):
+        n_fft, hop_length, win_length = self._stft_parameters()
+        key = (kind, self.sample_rate, n_fft, self.num_mels, hop_length,
+               win_length, self.dtype.name)
+        value = _cache.get(key)
+        if value is None:
+            value = build_fn()
+            value.flags.writeable = False
+            value = _cache.setdefault(key, value)
+        return value
+
+    def warm_cache(self):
+        r"""Build the filterbanks and windows of this processor, e.g. before
+        DataLoader workers are forked"""
+        self._get_mel_basis()
+        self._get_mel_basis_pinv()
+        self._get_window()
+
+    def _get_mel_basis(self):
+        return self._cached('mel_basis', self._build_mel_basis)
+
+    def _get_mel_basis_pinv(self):
+        return self._cached('mel_basis_pinv', lambda: np.linalg.pinv(
+            self._get_mel_basis()))
+
+    def _get_window(self):
+        win_length = self._stft_parameters()[2]
+        return self._cached('window', lambda: librosa.filters.get_window(
+            'hann', win_length, fftbins=True).astype(self.dtype))
 
     def _linear_to_mel(self, spectrogram):
-        global _mel_basis
-        if _mel_basis is None:
-            _mel_basis = self._build_mel_basis()
-        return np.dot(_mel_basis, spectrogram)
+        # matmul broadcasts over a leading batch dimension
+        return np.matmul(self._get_mel_basis(), spectrogram)
 
     def _build_mel_basis(self, ):
         n_fft = (self.num_freq - 1) * 2
-        return librosa.filters.mel(self.sample_rate, n_fft, n_mels=self.num_mels)
+        return librosa.filters.mel(sr=self.sample_rate, n_fft=n_fft,
+                                   n_mels=self.num_mels, dtype=self.dtype)
 
     def _normalize(self, S):
-        return np.clip((S - self.min_level_db) / -self.min_level_db, 0, 1)
+        # in place, S is a dB spectrogram computed by this processor
+        S -= self.min_level_db
+        S /= -self.min_level_db
+        return np.clip(S, 0, 1, out=S)
 
     def _denormalize(self, S):
-        return (np.clip(S, 0, 1) * -self.min_level_db) + self.min_level_db
+        S = np.clip(np.asarray(S, dtype=self.dtype), 0, 1)
+        S *= -self.min_level_db
+        S += self.min_level_db
+        return S
 
     def _stft_parameters(self, ):
         n_fft = (self.num_freq - 1) * 2
@@ -49,27 +147,44 @@ class AudioProcessor(object):
         win_length = int(self.frame_length_ms / 1000 * self.sample_rate)
         return n_fft, hop_length, win_length
 
+    def num_frames(self, num_samples):
+        r"""Number of spectrogram frames of a waveform of ```num_samples```
+        samples (centered STFT), works on arrays"""
+        return num_samples // self._stft_parameters()[1] + 1
+
     def _amp_to_db(self, x):
-        return 20 * np.log10(np.maximum(1e-5, x))
+        S = np.maximum(x, self.dtype.type(1e-5))
+        np.log10(S, out=S)
+        S *= 20
+        return S
 
     def _db_to_amp(self, x):
         return np.power(10.0, x * 0.05)
 
+    def _preemphasis_filter(self):
+        # lfilter keeps float32 only if the coefficients are float32 too
+        return (np.array([1, -self.preemphasis], dtype=self.dtype),
+                np.ones(1, dtype=self.dtype))
+
     def apply_preemphasis(self, x):
-        return signal.lfilter([1, -self.preemphasis], [1], x)
+        b, a = self._preemphasis_filter()
+        return signal.lfilter(b, a, np.asarray(x, dtype=self.dtype))
 
     def apply_inv_preemphasis(self, x):
-        return signal.lfilter([1], [1, -self.preemphasis], x)
+        b, a = self._preemphasis_filter()
+        return signal.lfilter(a, b, np.asarray(x, dtype=self.dtype))
 
     def spectrogram(self, y):
         D = self._stft(self.apply_preemphasis(y))
-        S = self._amp_to_db(np.abs(D)) - self.ref_level_db
+        S = self._amp_to_db(np.abs(D))
+        S -= self.ref_level_db
         return self._normalize(S)
 
     def inv_spectrogram(self, spectrogram):
         '''Converts spectrogram to waveform using librosa'''
         S = self._denormalize(spectrogram)
-        S = self._db_to_amp(S + self.ref_level_db)  # Convert back to linear
+        S += self.ref_level_db
+        S = self._db_to_amp(S)  # Convert back to linear
         # Reconstruct phase
         return self.apply_inv_preemphasis(self._griffin_lim(S ** self.power))
 
@@ -77,32 +192,215 @@ class AudioProcessor(object):
         '''librosa implementation of Griffin-Lim
         Based on https://github.com/librosa/librosa/issues/434
         '''
-        angles = np.exp(2j * np.pi * np.random.rand(*S.shape))
-        S_complex = np.abs(S).astype(np.complex)
+        angles = np.exp(2j * np.pi * np.random.rand(*S.shape)).astype(
+            self.complex_dtype)
+        S_complex = np.abs(S).astype(self.complex_dtype)
         y = self._istft(S_complex * angles)
         for i in range(self.griffin_lim_iters):
-            angles = np.exp(1j * np.angle(self._stft(y)))
+            D = self._stft(y)
+            # unit phases, in place
+            angles = np.divide(D, np.maximum(np.abs(D), 1e-8), out=D)
             y = self._istft(S_complex * angles)
         return y
 
+    def batch_inv_spectrogram(self, spectrograms, lengths, backend=None):
+        r'''Converts a B x F x T batch of spectrograms, padded after
+        ```lengths``` frames, to a list of trimmed waveforms. Griffin-Lim
+        runs on the whole batch at once with vectorized FFTs of the given
+        backend ('numpy' or 'torch' on CPU), by default the configured
+        ```stft_backend``` ('numpy' in place of 'librosa').'''
+        if backend is None:
+            backend = 'numpy' if self.stft_backend == 'librosa' \
+                else self.stft_backend
+        lengths = np.asarray(lengths)
+        wavs, _ = self._batch_griffin_lim(spectrograms, lengths, backend)
+        return wavs
+
+    def fast_inv_spectrogram(self, spectrogram, momentum=0.99, tol=None,
+                             time_budget=None, backend='numpy'):
+        r'''Converts a spectrogram to a waveform with Fast Griffin-Lim.
+        Stops after ```griffin_lim_iters``` iterations at most, once the
+        spectral convergence is below ```tol``` (around 0.2 is reached in a
+        few tens of iterations for power 1.5) or after ```time_budget```
+        seconds. Returns the waveform and a dict with the number of
+        iterations run and the final spectral convergence.'''
+        wavs, info = self._batch_griffin_lim(
+            spectrogram[None], [spectrogram.shape[1]], backend, momentum,
+            tol, time_budget)
+        return wavs[0], {'iters': info['iters'],
+                         'convergence': float(info['convergence'][0])}
+
+    def stream_inv_spectrogram(self, chunks, chunk_frames=40,
+                               context_frames=8, momentum=0.99,
+                               backend='numpy'):
+        r'''Converts spectrogram frames to audio as they arrive. ```chunks```
+        is an iterable of F x t spectrogram pieces, e.g. decoder outputs,
+        and finished waveform segments are yielded every ```chunk_frames```
+        frames (see stream_griffin_lim). Inverse preemphasis state is
+        carried across segments.'''
+        stft = self._batch_stft(backend)
+        magnitudes = (self._db_to_amp(self._denormalize(chunk) +
+                                      self.ref_level_db) ** self.power
+                      for chunk in chunks)
+        b, a = self._preemphasis_filter()
+        zi = np.zeros(1, dtype=self.dtype)
+        for segment in stream_griffin_lim(magnitudes, stft, chunk_frames,
+                                          context_frames,
+                                          self.griffin_lim_iters, momentum):
+            wav, zi = signal.lfilter(a, b, segment, zi=zi)
+            yield wav
+
+    def _batch_stft(self, backend):
+        stft = self._stfts.get(backend)
+        if stft is None:
+            n_fft, hop_length, win_length = self._stft_parameters()
+            stft = BACKENDS[backend](n_fft, hop_length, win_length,
+                                     self._get_window(), self.dtype)
+            self._stfts[backend] = stft
+        return stft
+
+    def _batch_griffin_lim(self, spectrograms, lengths, backend, momentum=0.,
+                           tol=None, time_budget=None):
+        lengths = np.asarray(lengths)
+        S = self._denormalize(spectrograms)
+        S += self.ref_level_db
+        S = self._db_to_amp(S) ** self.power
+        S *= (np.arange(S.shape[2])[None, :] < lengths[:, None])[:, None, :]
+        stft = self._batch_stft(backend)
+        wavs, info = batch_griffin_lim(S, lengths, stft,
+                                       self.griffin_lim_iters, momentum, tol,
+                                       time_budget)
+        return [self.apply_inv_preemphasis(wav) for wav in wavs], info
+
     def melspectrogram(self, y):
         D = self._stft(self.apply_preemphasis(y))
-        S = self._amp_to_db(self._linear_to_mel(np.abs(D))) - self.ref_level_db
+        S = self._amp_to_db(self._linear_to_mel(np.abs(D)))
+        S -= self.ref_level_db
+        return self._normalize(S)
+
+    def mel_to_linear(self, mel_spectrogram, method='pinv', nnls_iters=20):
+        r'''Approximate linear spectrogram (F x T, normalized like
+        ```spectrogram```) of a normalized mel spectrogram (M x T), so that
+        Griffin-Lim can run on decoder mel outputs without the postnet.
+        Magnitudes are mapped back with the cached pseudo-inverse of the
+        mel basis ('pinv'), optionally refined by ```nnls_iters``` projected
+        gradient steps of non-negative least squares ('nnls').'''
+        if method not in ('pinv', 'nnls'):
+            raise ValueError(" !! Unknown mel inversion {}".format(method))
+        mel = self._denormalize(mel_spectrogram)
+        mel += self.ref_level_db
+        mel = self._db_to_amp(mel)
+        S = np.matmul(self._get_mel_basis_pinv(), mel)
+        np.maximum(S, 0, out=S)
+        if method == 'nnls':
+            basis = self._get_mel_basis()
+            step = 1. / np.linalg.norm(basis, 2) ** 2
+            for _ in range(nnls_iters):
+                S -= step * np.matmul(basis.T, np.matmul(basis, S) - mel)
+                np.maximum(S, 0, out=S)
+        S = self._amp_to_db(S)
+        S -= self.ref_level_db
         return self._normalize(S)
 
+    def linear_and_mel_spectrogram(self, y):
+        r'''Linear and mel spectrograms of a waveform from a single STFT'''
+        S = np.abs(self._stft(self.apply_preemphasis(y)))
+        return self._magnitudes_to_features(S)
+
+    def batch_linear_and_mel_spectrogram(self, wavs):
+        r'''Linear and mel spectrograms of a list of waveforms. STFTs go
+        into a zero padded B x F x T array, then magnitudes, mel projection,
+        dB conversion and normalization run once over the whole batch.
+        Returns lists of D x T views into the batch arrays.'''
+        lengths = [self.num_frames(len(y)) for y in wavs]
+        if self.stft_backend == 'librosa':
+            # librosa takes one waveform at a time
+            D = np.zeros((len(wavs), self.num_freq, max(lengths)),
+                         dtype=self.complex_dtype)
+            for i, (y, length) in enumerate(zip(wavs, lengths)):
+                D[i, :, :length] = self._stft(self.apply_preemphasis(y))
+            S = np.abs(D)
+        else:
+            # zero padding at the end does not change the frames of shorter
+            # waveforms, so the whole batch goes through one STFT
+            y = np.zeros((len(wavs), max(len(y) for y in wavs)),
+                         dtype=self.dtype)
+            for i, wav in enumerate(wavs):
+                y[i, :len(wav)] = self.apply_preemphasis(wav)
+            stft = self._batch_stft(self.stft_backend)
+            S = np.abs(stft.to_numpy(stft.stft(stft.to_array(y))))
+        linear, mel = self._magnitudes_to_features(S)
+        return ([linear[i, :, :l] for i, l in enumerate(lengths)],
+                [mel[i, :, :l] for i, l in enumerate(lengths)])
+
+    def _magnitudes_to_features(self, S):
+        linear = self._amp_to_db(S)
+        linear -= self.ref_level_db
+        mel = self._amp_to_db(self._linear_to_mel(S))
+        mel -= self.ref_level_db
+        return self._normalize(linear), self._normalize(mel)
+
     def _stft(self, y):
+        if self.stft_backend != 'librosa':
+            stft = self._batch_stft(self.stft_backend)
+            return stft.to_numpy(stft.stft(stft.to_array(y)[None]))[0]
         n_fft, hop_length, win_length = self._stft_parameters()
-        return librosa.stft(y=y, n_fft=n_fft, hop_length=hop_length, win_length=win_length)
+        return librosa.stft(y=np.asarray(y, dtype=self.dtype), n_fft=n_fft,
+                            hop_length=hop_length, win_length=win_length,
+                            window=self._get_window(),
+                            dtype=self.complex_dtype)
 
     def _istft(self, y):
+        if self.stft_backend != 'librosa':
+            stft = self._batch_stft(self.stft_backend)
+            num_frames = y.shape[1]
+            y = stft.istft(stft.to_complex(y[None]),
+                           stft.window_sums([num_frames], num_frames))
+            return stft.to_numpy(y)[0]
         _, hop_length, win_length = self._stft_parameters()
-        return librosa.istft(y, hop_length=hop_length, win_length=win_length)
+        return librosa.istft(y, hop_length=hop_length, win_length=win_length,
+                             window=self._get_window(), dtype=self.dtype)
 
     def find_endpoint(self, wav, threshold_db=-40, min_silence_sec=0.8):
         window_length = int(self.sample_rate * min_silence_sec)
         hop_length = int(window_length / 4)
         threshold = self._db_to_amp(threshold_db)
-        for x in range(hop_length, len(wav) - window_length, hop_length):
-            if np.max(wav[x:x + window_length]) < threshold:
-                return x + hop_length
-        return len(wav)
+        if len(wav) - window_length <= hop_length:
+            return len(wav)
+        # windows starting at hop_length, hop_length * 2, ... as strided views
+        windows = np.lib.stride_tricks.sliding_window_view(
+            wav[hop_length:len(wav) - 1], window_length)[::hop_length]
+        silent = np.flatnonzero(windows.max(axis=1) < threshold)
+        if len(silent) == 0:
+            return len(wav)
+        return (silent[0] + 2) * hop_length
+
+    def frame_energy_db(self, wav):
+        r"""RMS energy in dB of the STFT frames of a waveform, computed on
+        strided views without copying the frames"""
+        _, hop_length, win_length = self._stft_parameters()
+        if len(wav) < win_length:
+            wav = np.pad(wav, (0, win_length - len(wav)))
+        frames = np.lib.stride_tricks.sliding_window_view(
+            wav, win_length)[::hop_length]
+        power = np.einsum('ij,ij->i', frames, frames) / win_length
+        return 10 * np.log10(np.maximum(power, 1e-10))
+
+    def trim_range(self, wav, trim_db=None):
+        r"""Sample range of a waveform without its leading and trailing
+        frames quieter than ```trim_db``` dB below the loudest frame, plus
+        ```trim_margin_ms``` on both sides"""
+        trim_db = self.trim_db if trim_db is None else trim_db
+        _, hop_length, win_length = self._stft_parameters()
+        energy = self.frame_energy_db(wav)
+        loud = np.flatnonzero(energy > energy.max() - trim_db)
+        margin = int(self.trim_margin_ms / 1000 * self.sample_rate)
+        start = max(loud[0] * hop_length - margin, 0)
+        end = min(loud[-1] * hop_length + win_length + margin, len(wav))
+        return start, end
+
+    def trim_silence(self, wav, trim_db=None):
+        r"""Waveform without leading and trailing silence, see
+        ```trim_range```"""
+        start, end = self.trim_range(wav, trim_db)
+        return wav[start:end]
@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+from multiprocessing import Pool
+
+
+def file_hash(path, block_size=1 << 20):
+    r"""sha1 of the content of a file"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def params_fingerprint(params):
+    r"""Hash of a json serializable dict of build parameters"""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode(
+        'utf-8')).hexdigest()
+
+
+def _stat_and_hash(args):
+    item_id, path, known = args
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        return item_id, None, str(e)
+    record = {'path': path, 'size': st.st_size, 'mtime': st.st_mtime}
+    # the content hash is only recomputed if the file was touched
+    if known is not None and all(known.get(k) == record[k]
+                                 for k in ['path', 'size', 'mtime']):
+        record['hash'] = known['hash']
+    else:
+        record['hash'] = file_hash(path)
+    return item_id, record, None
+
+
+class BuildState(object):
+    r"""Record of a preprocessing output (```build.json``` in its folder)
+    so that a rerun only processes new or changed files.
+
+    It keeps a fingerprint of the parameters the output was built with, a
+    content hash of the file of every item in the output and the files
+    that could not be read with their error. A different fingerprint
+    invalidates everything, a different hash invalidates an item and
+    unreadable files are not retried until they change.
+    """
+
+    def __init__(self, root_path):
+        self.path = os.path.join(root_path, 'build.json')
+        self.fingerprint = None
+        self.files = {}
+        self.failed = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            self.fingerprint = state['fingerprint']
+            self.files = state['files']
+            self.failed = state['failed']
+
+    def plan(self, items, fingerprint, num_workers=1, rebuild=False):
+        r"""Select the items to (re)build.
+
+        Args:
+            items: list of (item_id, path) tuples.
+            fingerprint: ```params_fingerprint``` of the build parameters.
+            num_workers: number of processes hashing files.
+            rebuild: discard the existing output even if the parameters
+                are the same.
+
+        Returns:
+            items to process, and True if the existing output has to be
+            discarded because it was built with other parameters.
+        """
+        reset = rebuild or fingerprint != self.fingerprint
+        if reset:
+            self.fingerprint = fingerprint
+            self.files = {}
+            self.failed = {}
+        jobs = [(item_id, path, self.files.get(item_id,
+                                               self.failed.get(item_id)))
+                for item_id, path in items]
+        pool = Pool(num_workers)
+        try:
+            records = pool.map(_stat_and_hash, jobs, chunksize=64)
+        finally:
+            pool.close()
+            pool.join()
+        self._pending = {}
+        todo = []
+        for (item_id, path), (_, record, error) in zip(items, records):
+            if record is None:
+                self.failed[item_id] = {'path': path, 'error': error}
+                continue
+            known = self.files.get(item_id, self.failed.get(item_id))
+            if known is not None and known.get('hash') == record['hash']:
+                continue
+            self._pending[item_id] = record
+            todo.append((item_id, path))
+        print(" | > {} of {} items to process, {} known unreadable".format(
+            len(todo), len(items), len(self.failed)))
+        return todo, reset
+
+    def update(self, built_ids, failed):
+        r"""Record the outcome of processing the planned items.
+
+        Args:
+            built_ids: ids of the items written to the output.
+            failed: dict of item id to error message of unreadable files.
+        """
+        for item_id in built_ids:
+            self.files[item_id] = self._pending[item_id]
+            self.failed.pop(item_id, None)
+        for item_id, error in failed.items():
+            record = dict(self._pending[item_id], error=error)
+            self.failed[item_id] = record
+            self.files.pop(item_id, None)
+            print(" !! Cannot read file : {} ({})".format(record['path'],
+                                                          error))
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'files': self.files,
+                       'failed': self.failed}, f)
+
+
+def load_failed_ids(root_path):
+    r"""Ids of the items of a preprocessing output that could not be
+    read"""
+    return sorted(BuildState(root_path).failed)
+
+
+def report_trimmed(num_frames, removed_frames):
+    r"""Print how many decoder frames silence trimming removed"""
+    print(" | > Trimming silence removed {} of {} decoder frames "
+          "({:.1f}%)".format(removed_frames, num_frames,
+                             100. * removed_frames / max(num_frames, 1)))
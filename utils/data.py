@@ -1,45 +1,119 @@
 import numpy as np
 
 
-def _pad_data(x, length):
-    _pad = 0
-    assert x.ndim == 1
-    return np.pad(x, (0, length - x.shape[0]),
-                  mode='constant',
-                  constant_values=_pad)
+def _round_up(length, out_steps):
+    remainder = length % out_steps
+    return length + (out_steps - remainder) if remainder > 0 else length
 
 
 def prepare_data(inputs):
     max_len = max((len(x) for x in inputs))
-    return np.stack([_pad_data(x, max_len) for x in inputs])
-
-
-def _pad_tensor(x, length):
-    _pad = 0
-    assert x.ndim == 2
-    x = np.pad(x, [[0, 0], [0, length - x.shape[1]]],
-               mode='constant', constant_values=_pad)
-    return x
+    out = np.zeros((len(inputs), max_len), dtype=inputs[0].dtype)
+    for i, x in enumerate(inputs):
+        assert x.ndim == 1
+        out[i, :x.shape[0]] = x
+    return out
 
 
 def prepare_tensor(inputs, out_steps):
     max_len = max((x.shape[1] for x in inputs)) + 1  # zero-frame
-    remainder = max_len % out_steps
-    pad_len = max_len + (out_steps - remainder) if remainder > 0 else max_len
-    return np.stack([_pad_tensor(x, pad_len) for x in inputs])
+    pad_len = _round_up(max_len, out_steps)
+    out = np.zeros((len(inputs), inputs[0].shape[0], pad_len),
+                   dtype=inputs[0].dtype)
+    for i, x in enumerate(inputs):
+        assert x.ndim == 2
+        out[i, :, :x.shape[1]] = x
+    return out
 
 
-def _pad_stop_target(x, length):
-    _pad = 1.
-    assert x.ndim == 1
-    return np.pad(x, (0, length - x.shape[0]), mode='constant', constant_values=_pad)
+def prepare_time_major_tensor(inputs, out_steps, dtype=np.float32):
+    r"""Pad T x D inputs into a single preallocated B x T x D array.
+
+    Each input is written straight into its slot of the output, so the
+    only copy made is the one into the batch (transposed views are
+    accepted). The result can be handed to torch.from_numpy() as is.
+    """
+    max_len = max((x.shape[0] for x in inputs)) + 1  # zero-frame
+    pad_len = _round_up(max_len, out_steps)
+    out = np.zeros((len(inputs), pad_len, inputs[0].shape[1]), dtype=dtype)
+    for i, x in enumerate(inputs):
+        assert x.ndim == 2
+        out[i, :x.shape[0]] = x
+    return out
 
 
 def prepare_stop_target(inputs, out_steps):
     max_len = max((x.shape[0] for x in inputs)) + 1  # zero-frame
-    remainder = max_len % out_steps
-    pad_len = max_len + (out_steps - remainder) if remainder > 0 else max_len
-    return np.stack([_pad_stop_target(x, pad_len) for x in inputs])
+    pad_len = _round_up(max_len, out_steps)
+    out = np.ones((len(inputs), pad_len), dtype=inputs[0].dtype)
+    for i, x in enumerate(inputs):
+        assert x.ndim == 1
+        out[i, :x.shape[0]] = x
+    return out
+
+
+def gather_ranges(data, offsets, idxs):
+    r"""Concatenate ```data[offsets[i]:offsets[i+1]]``` for i in idxs
+    without a Python loop. Returns the gathered data and its offsets."""
+    idxs = np.asarray(idxs, dtype=np.int64)
+    starts = offsets[idxs]
+    lengths = offsets[idxs + 1] - starts
+    new_offsets = np.zeros(len(idxs) + 1, dtype=np.int64)
+    new_offsets[1:] = np.cumsum(lengths)
+    positions = np.repeat(starts - new_offsets[:-1], lengths) + \
+        np.arange(new_offsets[-1])
+    return data[positions], new_offsets
+
+
+def find_sorted(keys, sorter, query):
+    r"""Positions of query values in keys, -1 for missing ones. sorter is
+    np.argsort(keys)."""
+    query = np.asarray(query)
+    pos = np.searchsorted(keys, query, sorter=sorter)
+    idxs = sorter[np.minimum(pos, len(keys) - 1)]
+    return np.where(keys[idxs] == query, idxs, -1)
+
+
+class ItemIndex(object):
+    r"""Lookup of items by id, shared by the preprocessing outputs (feature
+    store, packed audio, duration index). Subclasses set ```ids```,
+    ```lengths``` and ```sample_rate``` through ```_set_items``` and name
+    what they are in ```kind``` for error messages."""
+
+    kind = 'Index'
+
+    def _set_items(self, path, ids, lengths, sample_rate):
+        self.path = path
+        self.ids = ids
+        self.lengths = lengths
+        self.sample_rate = sample_rate
+        self._sorter = np.argsort(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return self.find([item_id])[0] >= 0
+
+    def find(self, item_ids):
+        r"""Index positions of the given item ids, -1 for missing ones"""
+        return find_sorted(self.ids, self._sorter, item_ids)
+
+    def _index(self, item_id):
+        idx = self.find([item_id])[0]
+        if idx < 0:
+            raise KeyError(item_id)
+        return idx
+
+    def get_length(self, item_id):
+        r"""Length of an item, in samples or frames"""
+        return int(self.lengths[self._index(item_id)])
+
+    def check_sample_rate(self, sample_rate):
+        if self.sample_rate != sample_rate:
+            raise ValueError(
+                " !! {} {} is sampled at {} Hz, expected {} Hz".format(
+                    self.kind, self.path, self.sample_rate, sample_rate))
 
 
 def pad_per_step(inputs, pad_len):
@@ -0,0 +1,80 @@
+import os
+import json
+import numpy as np
+import soundfile as sf
+from multiprocessing import Pool
+
+from TTS.utils.data import ItemIndex
+
+
+def wav_num_samples(wav_path, sample_rate):
+    r"""Number of samples of a file once resampled to ```sample_rate```,
+    read from its header without decoding the audio"""
+    info = sf.info(wav_path)
+    if info.samplerate == sample_rate:
+        return info.frames
+    return int(np.ceil(info.frames * sample_rate / float(info.samplerate)))
+
+
+def _read_header(args):
+    item_id, wav_path, sample_rate = args
+    try:
+        return item_id, wav_num_samples(wav_path, sample_rate), None
+    except Exception as e:
+        return item_id, None, str(e)
+
+
+class DurationIndex(ItemIndex):
+    r"""Number of samples of every item at the training sample rate, built
+    by ```build_duration_index``` from wav headers only. Together with the
+    hop length this gives the exact number of decoder frames of an item
+    (AudioProcessor.num_frames) before any audio is decoded. Files whose
+    header cannot be read are listed in ```failed_ids```.
+    """
+
+    kind = 'Duration index'
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        index = np.load(index_path)
+        self.meta = json.loads(str(index['meta']))
+        self._set_items(index_path, index['ids'], index['lengths'],
+                        self.meta['sample_rate'])
+        self.failed_ids = index['failed'].tolist()
+
+
+def build_duration_index(items, index_path, sample_rate, num_workers=1):
+    r"""Read the length of all items from their wav headers.
+
+    Args:
+        items: list of (item_id, wav_path) tuples.
+        index_path: output .npz file.
+        sample_rate: target sample rate.
+        num_workers: number of processes reading headers.
+    """
+    print(" > Reading headers of {} wav files".format(len(items)))
+    jobs = [(item_id, wav_path, sample_rate) for item_id, wav_path in items]
+    pool = Pool(num_workers)
+    try:
+        records = pool.map(_read_header, jobs, chunksize=64)
+    finally:
+        pool.close()
+        pool.join()
+    for item_id, _, error in records:
+        if error is not None:
+            print(" !! Cannot read file : {} ({})".format(item_id, error))
+    ids = np.array([item_id for item_id, n, _ in records if n is not None])
+    lengths = np.array([n for _, n, _ in records if n is not None],
+                       dtype=np.int64)
+    failed = np.array([item_id for item_id, n, _ in records if n is None],
+                      dtype=ids.dtype)
+    dirname = os.path.dirname(index_path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    meta = json.dumps({'sample_rate': sample_rate})
+    with open(index_path, 'wb') as f:
+        np.savez(f, meta=np.array(meta), ids=ids, lengths=lengths,
+                 failed=failed)
+    print(" | > {:.2f} hours of audio".format(
+        lengths.sum() / sample_rate / 3600.))
+    return DurationIndex(index_path)
@@ -0,0 +1,364 @@
+import os
+import json
+import numpy as np
+from multiprocessing import Pool
+
+from TTS.utils.data import ItemIndex
+from TTS.utils.resample import load_wav
+from TTS.utils.build_state import (BuildState, params_fingerprint,
+                                   load_failed_ids, report_trimmed)
+
+
+# storage formats; features are normalized to [0, 1] and integer formats
+# store them as fractions of the full range of the type
+DTYPES = ['float32', 'float16', 'uint16', 'uint8']
+
+
+def _shard_name(feature, shard_id):
+    return '{}_{:05d}.bin'.format(feature, shard_id)
+
+
+def quantize(x, dtype):
+    r"""Normalized features to the given storage dtype"""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'u':
+        scale = np.iinfo(dtype).max
+        return np.rint(np.clip(x, 0, 1) * scale).astype(dtype)
+    return x.astype(dtype)
+
+
+def dequantize(x):
+    r"""float32 features of stored values. Works on whole batches, so it
+    is cheapest to call once on a padded batch."""
+    if x.dtype.kind == 'u':
+        out = x.astype(np.float32)
+        out *= 1. / np.iinfo(x.dtype).max
+        return out
+    return x.astype(np.float32, copy=False)
+
+
+class FeatureStoreWriter(object):
+    r"""Append linear and mel spectrograms of a subset of the corpus to a
+    pair of flat shard files. Features are stored time-major (T x D) so that
+    the frames of one item are a contiguous slice of the shard.
+
+    The absolute error between the given and the stored features is
+    accumulated in ```errors``` (max, sum of squares, number of values per
+    feature)."""
+
+    def __init__(self, root_path, shard_id, linear_dim, mel_dim,
+                 dtype='float32'):
+        self.shard_id = shard_id
+        self.linear_dim = linear_dim
+        self.mel_dim = mel_dim
+        self.dtype = np.dtype(dtype)
+        self.linear_file = open(os.path.join(
+            root_path, _shard_name('linear', shard_id)), 'wb')
+        self.mel_file = open(os.path.join(
+            root_path, _shard_name('mel', shard_id)), 'wb')
+        self.ids = []
+        self.offsets = []
+        self.lengths = []
+        self.num_frames = 0
+        self.errors = {'linear': [0., 0., 0], 'mel': [0., 0., 0]}
+
+    def _write(self, f, feature, x):
+        x = x.T
+        stored = np.ascontiguousarray(quantize(x, self.dtype))
+        f.write(stored.tobytes())
+        if self.dtype != np.float32:
+            error = np.abs(dequantize(stored) - x)
+            stats = self.errors[feature]
+            stats[0] = max(stats[0], float(error.max()))
+            stats[1] += float(np.square(error, dtype=np.float64).sum())
+            stats[2] += error.size
+
+    def add(self, item_id, linear, mel):
+        r"""Write features of an item. Inputs are D x T as returned by
+        AudioProcessor."""
+        assert linear.shape[0] == self.linear_dim
+        assert mel.shape[0] == self.mel_dim
+        assert linear.shape[1] == mel.shape[1]
+        length = linear.shape[1]
+        self._write(self.linear_file, 'linear', linear)
+        self._write(self.mel_file, 'mel', mel)
+        self.ids.append(item_id)
+        self.offsets.append(self.num_frames)
+        self.lengths.append(length)
+        self.num_frames += length
+
+    def close(self):
+        self.linear_file.close()
+        self.mel_file.close()
+        return {'ids': self.ids,
+                'shards': [self.shard_id] * len(self.ids),
+                'offsets': self.offsets,
+                'lengths': self.lengths,
+                'errors': self.errors}
+
+
+class FeatureStore(ItemIndex):
+    r"""Read-only view of a feature store built by ```build_feature_store```.
+    Shards are memory-mapped on first access and items are returned as
+    zero-copy T x D slices of the stored dtype (see ```DTYPES```)."""
+
+    kind = 'Feature store'
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        with open(os.path.join(root_path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        index = np.load(os.path.join(root_path, 'index.npz'))
+        self._set_items(root_path, index['ids'], index['lengths'],
+                        self.meta['audio_params']['sample_rate'])
+        self.shards = index['shards']
+        self.offsets = index['offsets']
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.linear_dim = self.meta['linear_dim']
+        self.mel_dim = self.meta['mel_dim']
+        self.failed_ids = load_failed_ids(root_path)
+        self._linear = {}
+        self._mel = {}
+
+    def check_params(self, ap):
+        r"""Refuse the store if it was built with different audio
+        parameters than the given AudioProcessor"""
+        params = ap.feature_params()
+        stored = self.meta['audio_params']
+        mismatch = [k for k in params if stored.get(k) != params[k]]
+        if mismatch:
+            raise ValueError(
+                " !! Feature store {} is built with different audio "
+                "parameters: {}".format(self.root_path, ', '.join(
+                    "{} ({} != {})".format(k, stored.get(k), params[k])
+                    for k in mismatch)))
+
+    def _open(self, cache, feature, shard_id, dim):
+        if shard_id not in cache:
+            path = os.path.join(self.root_path, _shard_name(feature, shard_id))
+            cache[shard_id] = np.memmap(path, dtype=self.dtype,
+                                        mode='r').reshape(-1, dim)
+        return cache[shard_id]
+
+    def load(self, item_id, raw=False):
+        r"""Return (linear, mel) of an item as T x D arrays"""
+        return self.load_index(self._index(item_id), raw)
+
+    def load_index(self, idx, raw=False):
+        r"""Return (linear, mel) of the item at the given store index.
+        With ```raw``` the stored values are returned without conversion
+        to float32, to be dequantized later in bulk."""
+        shard_id = int(self.shards[idx])
+        start = int(self.offsets[idx])
+        end = start + int(self.lengths[idx])
+        linear = self._open(self._linear, 'linear', shard_id,
+                            self.linear_dim)[start:end]
+        mel = self._open(self._mel, 'mel', shard_id, self.mel_dim)[start:end]
+        if raw:
+            return linear, mel
+        return dequantize(linear), dequantize(mel)
+
+
+def _build_shard(args):
+    root_path, shard_id, items, ap, dtype, resample_quality = args
+    writer = FeatureStoreWriter(root_path, shard_id, ap.num_freq, ap.num_mels,
+                                dtype)
+    failed = {}
+    trimmed = [0, 0]
+    for item_id, wav_path in items:
+        try:
+            wav = load_wav(wav_path, ap.sample_rate, resample_quality)
+        except Exception as e:
+            failed[item_id] = str(e)
+            continue
+        wav, num_frames, removed = ap.trim_for_training(wav)
+        trimmed[0] += num_frames
+        trimmed[1] += removed
+        linear, mel = ap.linear_and_mel_spectrogram(wav)
+        writer.add(item_id, linear, mel)
+    index = writer.close()
+    index['failed'] = failed
+    index['trimmed'] = trimmed
+    return index
+
+
+def _remove_shards(root_path, num_shards):
+    for shard_id in range(num_shards):
+        for feature in ['linear', 'mel']:
+            path = os.path.join(root_path, _shard_name(feature, shard_id))
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _num_stored_frames(root_path, num_shards, mel_dim, dtype):
+    r"""Number of frames in the shards, stale ones included"""
+    frame_size = mel_dim * np.dtype(dtype).itemsize
+    return sum(os.path.getsize(os.path.join(
+        root_path, _shard_name('mel', shard_id))) // frame_size
+        for shard_id in range(num_shards))
+
+
+def _compact_shards(root_path, index, num_shards, dims, dtype):
+    r"""Rewrite the shards with only the frames of the indexed items,
+    dropping those of replaced items and empty shards. Offsets and shard
+    ids of ```index``` are updated in place. Returns the new number of
+    shards."""
+    shards = np.array(index['shards'], dtype=np.int64)
+    offsets = np.array(index['offsets'], dtype=np.int64)
+    lengths = np.array(index['lengths'], dtype=np.int64)
+    new_shards = shards.copy()
+    new_offsets = offsets.copy()
+    new_id = 0
+    for shard_id in range(num_shards):
+        idxs = np.where(shards == shard_id)[0]
+        idxs = idxs[np.argsort(offsets[idxs])]
+        for feature, dim in dims.items():
+            path = os.path.join(root_path, _shard_name(feature, shard_id))
+            if not len(idxs):
+                os.remove(path)
+                continue
+            data = np.memmap(path, dtype=dtype, mode='r').reshape(-1, dim)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for start, length in zip(offsets[idxs], lengths[idxs]):
+                    f.write(data[start:start + length].tobytes())
+            del data
+            # shards before new_id are already rewritten, so the target is
+            # free or this very shard
+            os.replace(tmp_path, os.path.join(
+                root_path, _shard_name(feature, new_id)))
+            if new_id != shard_id:
+                os.remove(path)
+        if len(idxs):
+            new_shards[idxs] = new_id
+            new_offsets[idxs] = np.cumsum(lengths[idxs]) - lengths[idxs]
+            new_id += 1
+    index['shards'] = new_shards.tolist()
+    index['offsets'] = new_offsets.tolist()
+    return new_id
+
+
+def _report_errors(errors, ap):
+    r"""Summarize accumulated quantization errors in normalized units and
+    in dB"""
+    report = {}
+    for feature, (max_error, sum_sq, count) in errors.items():
+        rms_error = np.sqrt(sum_sq / max(count, 1))
+        report[feature] = {'max': max_error, 'rms': float(rms_error)}
+        print(" | > {} reconstruction error: max {:.2e} ({:.3f} dB), "
+              "rms {:.2e} ({:.3f} dB)".format(
+                  feature, max_error, max_error * -ap.min_level_db,
+                  rms_error, rms_error * -ap.min_level_db))
+    return report
+
+
+def build_feature_store(items, root_path, ap, num_workers=1,
+                        dtype='float32', resample_quality='medium',
+                        rebuild=False, compact_ratio=0.3):
+    r"""Compute features of all items once and write them into a feature
+    store.
+
+    Builds are incremental: items whose file is unchanged since the last
+    build with the same parameters are kept, new and changed ones are
+    written to new shards and unreadable files are recorded and skipped
+    (see ```BuildState```). The frames of changed items stay in their old
+    shards until more than ```compact_ratio``` of all stored frames are
+    stale, then the shards are rewritten without them. Items of previous
+    builds that are not given again are kept.
+
+    Args:
+        items: list of (item_id, wav_path) tuples.
+        root_path: output folder of the store.
+        ap: AudioProcessor used to compute the features.
+        num_workers: number of processes, each writes its own shard.
+        dtype: storage format, one of ```DTYPES```. The error of the stored
+            features against float32 ones is reported and saved in the
+            meta file.
+        resample_quality: quality of resampling files to the sample rate
+            of ```ap```, see ```resample```.
+        rebuild: discard the existing store and compute all items.
+        compact_ratio: fraction of stale frames above which the shards
+            are compacted.
+    """
+    assert dtype in DTYPES
+    os.makedirs(root_path, exist_ok=True)
+    print(" > Building feature store at {}".format(root_path))
+    state = BuildState(root_path)
+    fingerprint = params_fingerprint({'audio_params': ap.feature_params(),
+                                      'trim_params': ap.trim_params(),
+                                      'dtype': dtype,
+                                      'resample_quality': resample_quality})
+    items, reset = state.plan(items, fingerprint, num_workers, rebuild)
+    meta_path = os.path.join(root_path, 'meta.json')
+    index_path = os.path.join(root_path, 'index.npz')
+    index = {'ids': [], 'shards': [], 'offsets': [], 'lengths': []}
+    errors = {'linear': [0., 0., 0], 'mel': [0., 0., 0]}
+    trimmed = [0, 0]
+    first_shard = 0
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if reset:
+            _remove_shards(root_path, meta['num_shards'])
+        else:
+            # keep unchanged items of previous builds
+            first_shard = meta['num_shards']
+            errors = meta.get('error_stats', errors)
+            previous = np.load(index_path)
+            keep = ~np.isin(previous['ids'], [i for i, _ in items])
+            for key in index:
+                index[key] = previous[key][keep].tolist()
+    num_shards = max(1, min(num_workers, len(items))) if items else 0
+    chunk = int(np.ceil(len(items) / max(num_shards, 1)))
+    jobs = [(root_path, first_shard + i, items[i * chunk:(i + 1) * chunk],
+             ap, dtype, resample_quality) for i in range(num_shards)]
+    print(" | > {} items in {} new shards".format(len(items), num_shards))
+    pool = Pool(num_workers)
+    try:
+        for shard_index in pool.imap(_build_shard, jobs):
+            for key in index:
+                index[key] += shard_index[key]
+            for feature, (max_error, sum_sq, count) in \
+                    shard_index['errors'].items():
+                stats = errors[feature]
+                stats[0] = max(stats[0], max_error)
+                stats[1] += sum_sq
+                stats[2] += count
+            state.update(shard_index['ids'], shard_index['failed'])
+            trimmed[0] += shard_index['trimmed'][0]
+            trimmed[1] += shard_index['trimmed'][1]
+            print(" | > Shard {} is done ({} items)".format(
+                shard_index['shards'][0] if shard_index['shards'] else '-',
+                len(shard_index['ids'])))
+    finally:
+        pool.close()
+        pool.join()
+    if ap.trim_db is not None:
+        report_trimmed(*trimmed)
+    num_shards += first_shard
+    num_frames = _num_stored_frames(root_path, num_shards, ap.num_mels, dtype)
+    stale = 1. - np.sum(index['lengths']) / float(num_frames) \
+        if num_frames else 0.
+    if stale > compact_ratio:
+        print(" | > Compacting shards, {:.0%} of the frames are stale".format(
+            stale))
+        num_shards = _compact_shards(root_path, index, num_shards,
+                                     {'linear': ap.num_freq,
+                                      'mel': ap.num_mels}, dtype)
+    np.savez(index_path,
+             ids=np.array(index['ids']),
+             shards=np.array(index['shards'], dtype=np.int32),
+             offsets=np.array(index['offsets'], dtype=np.int64),
+             lengths=np.array(index['lengths'], dtype=np.int32))
+    meta = {'audio_params': ap.feature_params(),
+            'dtype': dtype,
+            'linear_dim': ap.num_freq,
+            'mel_dim': ap.num_mels,
+            'num_shards': num_shards}
+    if dtype != 'float32':
+        meta['error_stats'] = errors
+        meta['reconstruction_error'] = _report_errors(errors, ap)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    state.save()
+    return FeatureStore(root_path)
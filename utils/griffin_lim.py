@@ -0,0 +1,301 @@
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+def _overlap_add(frames, hop_length):
+    r"""Sum B x T x n_fft frames placed every ```hop_length``` samples into
+    B x (n_fft + hop_length * (T - 1)) signals. Frames are cut into hop
+    sized chunks and each chunk position is added with a single
+    vectorized slice, so the loop runs ceil(n_fft / hop) times."""
+    batch_size, num_frames, n_fft = frames.shape
+    num_chunks = -(-n_fft // hop_length)
+    frames = np.pad(frames, [(0, 0), (0, 0),
+                             (0, num_chunks * hop_length - n_fft)])
+    frames = frames.reshape(batch_size, num_frames, num_chunks, hop_length)
+    out = np.zeros((batch_size, (num_frames + num_chunks - 1) * hop_length),
+                   dtype=frames.dtype)
+    for k in range(num_chunks):
+        out[:, k * hop_length:(k + num_frames) * hop_length] += \
+            frames[:, :, k].reshape(batch_size, -1)
+    return out[:, :n_fft + hop_length * (num_frames - 1)]
+
+
+def _window_sums(window, hop_length, lengths, num_frames):
+    n_fft = len(window)
+    lengths = np.asarray(lengths)
+    frames = np.zeros((len(lengths), num_frames, n_fft), dtype=window.dtype)
+    frames[np.arange(num_frames)[None, :] < lengths[:, None]] = window ** 2
+    sums = _overlap_add(frames, hop_length)
+    pad = n_fft // 2
+    sums = sums[:, pad:pad + (num_frames - 1) * hop_length]
+    sums[sums <= np.finfo(window.dtype).tiny] = 1.
+    return sums
+
+
+class NumpySTFT(object):
+    r"""Batched STFT and inverse STFT with numpy FFTs, matching
+    librosa.stft/istft with center=True and zero padding.
+
+    Inverse transforms are normalized per utterance, so that a padded
+    batch gives the same samples as utterances processed alone.
+
+    Args:
+        n_fft, hop_length, win_length: STFT parameters.
+        window: analysis window of ```win_length``` samples.
+        dtype: float32 (complex64 spectrograms) or float64 (complex128).
+    """
+
+    def __init__(self, n_fft, hop_length, win_length, window,
+                 dtype=np.float32):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.win_length = win_length
+        self.dtype = np.dtype(dtype)
+        self.complex_dtype = np.result_type(self.dtype, np.complex64)
+        lpad = (n_fft - win_length) // 2
+        self._window = np.zeros(n_fft, dtype=self.dtype)
+        self._window[lpad:lpad + win_length] = window
+        self.window = self._window
+        self._last_sums = (None, None)
+
+    def num_samples(self, num_frames):
+        return (num_frames - 1) * self.hop_length
+
+    def window_sums(self, lengths, num_frames):
+        r"""Per utterance B x N normalization of the inverse STFT of
+        utterances of ```lengths``` frames padded to ```num_frames```. The
+        last result is kept, as iterative inversions ask for the same one
+        over and over."""
+        key = (tuple(int(n) for n in lengths), num_frames)
+        if self._last_sums[0] != key:
+            self._last_sums = (key, _window_sums(
+                self._window, self.hop_length, lengths, num_frames))
+        return self._last_sums[1]
+
+    def stft(self, y):
+        r"""B x N signals to B x F x T complex spectrograms"""
+        pad = self.n_fft // 2
+        y = np.pad(y, [(0, 0), (pad, pad)])
+        frames = np.lib.stride_tricks.sliding_window_view(
+            y, self.n_fft, axis=-1)[:, ::self.hop_length]
+        return np.fft.rfft(frames * self.window, axis=-1).transpose(0, 2, 1)
+
+    def istft(self, D, window_sums):
+        r"""B x F x T complex spectrograms to B x N signals"""
+        frames = np.fft.irfft(D.transpose(0, 2, 1), n=self.n_fft, axis=-1)
+        y = _overlap_add(frames * self.window, self.hop_length)
+        pad = self.n_fft // 2
+        return y[:, pad:pad + window_sums.shape[1]] / window_sums
+
+    def phase(self, D):
+        return D / np.maximum(np.abs(D), 1e-8)
+
+    def random_phase(self, shape):
+        return np.exp(2j * np.pi * np.random.rand(*shape)).astype(
+            self.complex_dtype)
+
+    def to_array(self, x):
+        return np.asarray(x, dtype=self.dtype)
+
+    def to_complex(self, x):
+        return np.asarray(x, dtype=self.complex_dtype)
+
+    def to_numpy(self, x):
+        return x
+
+
+class TorchSTFT(NumpySTFT):
+    r"""Batched STFT and inverse STFT with torch FFTs on CPU. Same interface
+    and results as NumpySTFT, on torch tensors."""
+
+    def __init__(self, n_fft, hop_length, win_length, window,
+                 dtype=np.float32):
+        super(TorchSTFT, self).__init__(n_fft, hop_length, win_length,
+                                        window, dtype)
+        self.window = torch.from_numpy(self._window)
+        self._complex = torch.from_numpy(
+            np.zeros(0, dtype=self.complex_dtype)).dtype
+
+    def window_sums(self, lengths, num_frames):
+        return torch.from_numpy(super(TorchSTFT, self).window_sums(
+            lengths, num_frames))
+
+    def stft(self, y):
+        return torch.stft(y, self.n_fft, hop_length=self.hop_length,
+                          window=self.window, center=True,
+                          pad_mode='constant', return_complex=True)
+
+    def istft(self, D, window_sums):
+        frames = torch.fft.irfft(D.transpose(1, 2), n=self.n_fft, dim=-1)
+        frames = (frames * self.window).transpose(1, 2)
+        num_frames = D.shape[2]
+        length = self.n_fft + self.hop_length * (num_frames - 1)
+        y = F.fold(frames, output_size=(1, length),
+                   kernel_size=(1, self.n_fft),
+                   stride=(1, self.hop_length)).view(D.shape[0], -1)
+        pad = self.n_fft // 2
+        return y[:, pad:pad + window_sums.shape[1]] / window_sums
+
+    def phase(self, D):
+        return D / D.abs().clamp(min=1e-8)
+
+    def random_phase(self, shape):
+        return torch.exp(2j * np.pi * torch.rand(*shape)).to(self._complex)
+
+    def to_array(self, x):
+        return torch.as_tensor(np.asarray(x, dtype=self.dtype))
+
+    def to_complex(self, x):
+        if torch.is_tensor(x):
+            return x
+        return torch.from_numpy(np.asarray(x, dtype=self.complex_dtype))
+
+    def to_numpy(self, x):
+        return x.numpy()
+
+
+BACKENDS = {'numpy': NumpySTFT, 'torch': TorchSTFT}
+
+
+def batch_griffin_lim(S, lengths, stft, num_iters, momentum=0., tol=None,
+                      time_budget=None, angles=None):
+    r"""Griffin-Lim phase reconstruction of a batch of utterances at once.
+
+    With ```momentum``` > 0 this is Fast Griffin-Lim (Perraudin et al.
+    2013), which converges in fewer iterations (0.99 is a good value).
+    Iterations stop early once the spectral convergence
+    ||S - |STFT(y)||| / ||S|| of every utterance is below ```tol``` or
+    after ```time_budget``` seconds.
+
+    Args:
+        S: B x F x T magnitude spectrograms, zero padded after the
+            ```lengths``` frames of each utterance.
+        lengths: number of frames of each utterance.
+        stft: NumpySTFT or TorchSTFT instance.
+        num_iters: maximum number of iterations.
+        momentum: momentum of Fast Griffin-Lim, 0 for plain Griffin-Lim.
+        tol: spectral convergence to stop at, None to run all iterations.
+        time_budget: seconds to stop after, None for no limit.
+        angles: B x F x T initial unit phases, random if None.
+
+    Returns:
+        list of waveforms (numpy) trimmed to the length of each utterance,
+        and a dict with the number of iterations run ('iters') and the
+        spectral convergence of each returned waveform ('convergence').
+    """
+    start_time = time.time()
+    lengths = np.asarray(lengths)
+    S = stft.to_array(S)
+    window_sums = stft.window_sums(lengths, S.shape[2])
+    num_samples = stft.num_samples(lengths)
+    # keep the padding silent, as it is for an utterance processed alone
+    mask = stft.to_array(np.arange(window_sums.shape[1])[None, :] <
+                         num_samples[:, None])
+    frame_mask = stft.to_array(np.arange(S.shape[2])[None, None, :] <
+                               lengths[:, None, None])
+    S_norm = (S ** 2).sum((1, 2)) ** 0.5
+    if angles is None:
+        angles = stft.random_phase(S.shape)
+
+    def spectral_convergence(rebuilt):
+        return stft.to_numpy(
+            (((S - abs(rebuilt)) * frame_mask) ** 2).sum((1, 2)) ** 0.5 /
+            S_norm)
+
+    y = stft.istft(S * stft.to_complex(angles), window_sums) * mask
+    # the STFT of each iterate feeds the next update and measures it
+    rebuilt = stft.stft(y)
+    convergence = spectral_convergence(rebuilt)
+    rebuilt_prev = 0
+    iters = 0
+    while iters < num_iters:
+        angles = rebuilt - (momentum / (1 + momentum)) * rebuilt_prev
+        rebuilt_prev = rebuilt
+        y = stft.istft(S * stft.phase(angles), window_sums) * mask
+        iters += 1
+        rebuilt = stft.stft(y)
+        convergence = spectral_convergence(rebuilt)
+        if tol is not None and (convergence < tol).all():
+            break
+        if time_budget is not None and \
+                time.time() - start_time > time_budget:
+            break
+    y = stft.to_numpy(y)
+    info = {'iters': iters, 'convergence': convergence}
+    return [y[i, :n] for i, n in enumerate(num_samples)], info
+
+
+def stream_griffin_lim(chunks, stft, chunk_frames, context_frames, num_iters,
+                       momentum=0.):
+    r"""Reconstruct waveforms of spectrogram frames as they arrive.
+
+    Frames are inverted ```chunk_frames``` at a time with Griffin-Lim,
+    together with ```context_frames``` frames of context on both sides,
+    and finished samples are yielded right away. The phase of the left
+    context is initialized from the previous chunk and consecutive
+    segments are cross-faded over half of the right context, so seams
+    stay continuous. Yielded segments concatenate to the
+    (T - 1) * hop_length samples of the non streaming inversion.
+
+    Args:
+        chunks: iterable of F x t magnitude spectrogram pieces of any size.
+        stft: NumpySTFT or TorchSTFT instance.
+        chunk_frames: number of frames inverted per step.
+        context_frames: number of context frames on each side, >= 2.
+        num_iters: Griffin-Lim iterations per chunk.
+        momentum: Fast Griffin-Lim momentum.
+    """
+    assert context_frames >= 2
+    hop_length = stft.hop_length
+    xfade = context_frames * hop_length // 2
+    ramp = np.linspace(0, 1, xfade, endpoint=False).astype(stft.dtype)
+    state = {'buffer': None, 'buffer_start': 0, 'start': 0, 'tail': None,
+             'previous': None}
+
+    def invert(end, final):
+        start = state['start']
+        first = max(start - context_frames, 0)
+        last = end if final else end + context_frames
+        S = state['buffer'][:, first - state['buffer_start']:
+                            last - state['buffer_start']]
+        angles = np.exp(2j * np.pi * np.random.rand(1, *S.shape)).astype(
+            stft.complex_dtype)
+        if state['previous'] is not None:
+            # warm start the frames shared with the previous chunk
+            prev_first, prev_wav = state['previous']
+            D = stft.to_numpy(stft.stft(stft.to_array(prev_wav[None])))[0]
+            overlap = prev_first + D.shape[1] - first
+            if overlap > 0:
+                D = D[:, first - prev_first:]
+                angles[0, :, :overlap] = D / np.maximum(np.abs(D), 1e-8)
+        wavs, _ = batch_griffin_lim(S[None], [S.shape[1]], stft, num_iters,
+                                    momentum, angles=angles)
+        wav = wavs[0]
+        offset = first * hop_length
+        out_end = ((last - 1) if final else end) * hop_length - offset
+        out = np.array(wav[start * hop_length - offset:out_end])
+        if state['tail'] is not None:
+            n = min(xfade, len(out))
+            out[:n] = state['tail'][:n] * (1 - ramp[:n]) + out[:n] * ramp[:n]
+        state['tail'] = wav[out_end:out_end + xfade]
+        state['previous'] = (first, wav)
+        state['start'] = end
+        # keep the left context of the next chunk
+        keep = max(end - context_frames, 0)
+        state['buffer'] = state['buffer'][:, keep - state['buffer_start']:]
+        state['buffer_start'] = keep
+        return out
+
+    for chunk in chunks:
+        if state['buffer'] is None:
+            state['buffer'] = np.asarray(chunk, dtype=stft.dtype)
+        else:
+            state['buffer'] = np.concatenate([state['buffer'], chunk], axis=1)
+        num_frames = state['buffer_start'] + state['buffer'].shape[1]
+        while num_frames >= state['start'] + chunk_frames + context_frames:
+            yield invert(state['start'] + chunk_frames, final=False)
+    if state['buffer'] is not None:
+        num_frames = state['buffer_start'] + state['buffer'].shape[1]
+        yield invert(num_frames, final=True)
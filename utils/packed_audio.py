@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+from multiprocessing import Pool
+
+from TTS.utils.data import ItemIndex
+from TTS.utils.resample import load_wav
+from TTS.utils.build_state import (BuildState, params_fingerprint,
+                                   load_failed_ids, report_trimmed)
+
+
+class PackedAudio(ItemIndex):
+    r"""Read-only view of a packed audio corpus built by
+    ```build_packed_audio```. All waveforms are resampled once and stored
+    back to back in a single file which is memory-mapped, so reading an
+    item is a slice of the map. When the corpus is staged on a RAM disk
+    (e.g. /run/shm) no disk I/O or decoding is left on the loader path.
+
+    float32 corpora return zero-copy read-only views; int16 corpora are
+    scaled to float32 on read.
+    """
+
+    kind = 'Packed audio'
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        with open(os.path.join(root_path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        index = np.load(os.path.join(root_path, 'index.npz'))
+        self._set_items(root_path, index['ids'], index['lengths'],
+                        self.meta['sample_rate'])
+        self.offsets = index['offsets']
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.failed_ids = load_failed_ids(root_path)
+        self._data = None
+
+    def load(self, item_id):
+        return self.load_index(self._index(item_id))
+
+    def load_index(self, idx):
+        r"""Waveform of the item at the given store index"""
+        if self._data is None:
+            self._data = np.memmap(os.path.join(self.root_path, 'audio.bin'),
+                                   dtype=self.dtype, mode='r')
+        start = int(self.offsets[idx])
+        wav = self._data[start:start + int(self.lengths[idx])]
+        if self.dtype == np.int16:
+            return wav.astype(np.float32) / 32768.
+        return wav
+
+
+def _load_resampled(args):
+    item_id, wav_path, sample_rate, ap, resample_quality = args
+    try:
+        wav = load_wav(wav_path, sample_rate, resample_quality)
+    except Exception as e:
+        return item_id, None, str(e), (0, 0)
+    if ap is None:
+        return item_id, wav, None, (0, 0)
+    wav, num_frames, removed = ap.trim_for_training(wav)
+    return item_id, wav, None, (num_frames, removed)
+
+
+def build_packed_audio(items, root_path, sample_rate, dtype='float32',
+                       num_workers=1, ap=None, resample_quality='medium',
+                       rebuild=False):
+    r"""Resample all items once and pack them into a single file.
+
+    Builds are incremental: items whose file is unchanged since the last
+    build with the same parameters are kept, new and changed ones are
+    appended and unreadable files are recorded and skipped (see
+    ```BuildState```). Samples of replaced items stay unused in the file
+    until the next full build, which ```rebuild``` forces.
+
+    Args:
+        items: list of (item_id, wav_path) tuples.
+        root_path: output folder.
+        sample_rate: target sample rate.
+        dtype: 'float32' or 'int16' storage.
+        num_workers: number of processes loading and resampling files.
+        ap: AudioProcessor trimming silence (if its ```trim_db``` is set).
+        resample_quality: see ```resample```.
+        rebuild: discard the existing corpus and pack all items.
+    """
+    assert dtype in ['float32', 'int16']
+    os.makedirs(root_path, exist_ok=True)
+    print(" > Packing {} wav files at {} Hz into {}".format(
+        len(items), sample_rate, root_path))
+    state = BuildState(root_path)
+    fingerprint = params_fingerprint({
+        'sample_rate': sample_rate, 'dtype': dtype,
+        'resample_quality': resample_quality,
+        'trim_params': ap.trim_params() if ap is not None else None})
+    items, reset = state.plan(items, fingerprint, num_workers, rebuild)
+    audio_path = os.path.join(root_path, 'audio.bin')
+    index_path = os.path.join(root_path, 'index.npz')
+    ids = []
+    offsets = []
+    lengths = []
+    num_samples = 0
+    mode = 'wb'
+    if not reset and os.path.exists(index_path):
+        # keep unchanged items of previous builds
+        previous = np.load(index_path)
+        keep = ~np.isin(previous['ids'], [i for i, _ in items])
+        ids = previous['ids'][keep].tolist()
+        offsets = previous['offsets'][keep].tolist()
+        lengths = previous['lengths'][keep].tolist()
+        num_samples = os.path.getsize(audio_path) // np.dtype(dtype).itemsize
+        mode = 'ab'
+    jobs = [(item_id, wav_path, sample_rate, ap, resample_quality)
+            for item_id, wav_path in items]
+    built_ids = []
+    trimmed = [0, 0]
+    failed = {}
+    pool = Pool(num_workers)
+    try:
+        with open(audio_path, mode) as f:
+            for item_id, wav, error, frames in pool.imap(
+                    _load_resampled, jobs, chunksize=16):
+                if wav is None:
+                    failed[item_id] = error
+                    continue
+                trimmed[0] += frames[0]
+                trimmed[1] += frames[1]
+                if dtype == 'int16':
+                    wav = np.clip(wav * 32768., -32768, 32767)
+                f.write(wav.astype(dtype).tobytes())
+                ids.append(item_id)
+                built_ids.append(item_id)
+                offsets.append(num_samples)
+                lengths.append(len(wav))
+                num_samples += len(wav)
+    finally:
+        pool.close()
+        pool.join()
+    state.update(built_ids, failed)
+    if ap is not None and ap.trim_db is not None:
+        report_trimmed(*trimmed)
+    np.savez(index_path, ids=np.array(ids),
+             offsets=np.array(offsets, dtype=np.int64),
+             lengths=np.array(lengths, dtype=np.int64))
+    meta = {'sample_rate': sample_rate, 'dtype': dtype}
+    with open(os.path.join(root_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    state.save()
+    print(" | > {:.2f} hours of audio".format(
+        np.sum(lengths) / sample_rate / 3600.))
+    return PackedAudio(root_path)
@@ -0,0 +1,102 @@
+import time
+import threading
+import torch
+from queue import Queue, Full
+
+_END = object()
+
+
+class BatchPrefetcher(object):
+    r"""Wrap a DataLoader and prepare the next batches in a background
+    thread while the training loop is computing.
+
+    With CUDA, tensors of a batch are pinned (if the loader did not do it
+    already) and copied to the GPU asynchronously on a side stream, so the
+    host to device transfer is off the critical path. On CPU only runs
+    batches are just fetched ahead of time.
+
+    ```wait_time``` accumulates the seconds the training loop spent
+    waiting for data since the start of the epoch and ```last_wait_time```
+    holds the wait of the latest batch. A loop that waits a noticeable
+    share of its step time is input bound.
+
+    Other attributes (e.g. ```dataset```, ```batch_sampler```) are those of
+    the wrapped DataLoader.
+    """
+
+    def __init__(self, data_loader, use_cuda, num_prefetch=2):
+        self.data_loader = data_loader
+        self.use_cuda = use_cuda
+        self.num_prefetch = num_prefetch
+        self.stream = torch.cuda.Stream() if use_cuda else None
+        self.wait_time = 0
+        self.last_wait_time = 0
+
+    def __getattr__(self, name):
+        if name == 'data_loader':
+            raise AttributeError(name)
+        return getattr(self.data_loader, name)
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def _to_device(self, batch):
+        with torch.cuda.stream(self.stream):
+            batch = [x if not torch.is_tensor(x) else
+                     (x if x.is_pinned() else x.pin_memory()).cuda(
+                         non_blocking=True) for x in batch]
+            event = torch.cuda.Event()
+            event.record(self.stream)
+        return batch, event
+
+    @staticmethod
+    def _put(queue, stop, item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _worker(self, queue, stop):
+        try:
+            for batch in self.data_loader:
+                item = self._to_device(batch) if self.use_cuda else \
+                    (batch, None)
+                if not self._put(queue, stop, item):
+                    return
+            self._put(queue, stop, _END)
+        except Exception as e:
+            self._put(queue, stop, e)
+
+    def __iter__(self):
+        self.wait_time = 0
+        self.last_wait_time = 0
+        queue = Queue(maxsize=self.num_prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._worker, args=(queue, stop))
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                start_time = time.time()
+                item = queue.get()
+                self.last_wait_time = time.time() - start_time
+                self.wait_time += self.last_wait_time
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                batch, event = item
+                if event is not None:
+                    current_stream = torch.cuda.current_stream()
+                    current_stream.wait_event(event)
+                    # tensors are used on the main stream from now on
+                    for x in batch:
+                        if torch.is_tensor(x):
+                            x.record_stream(current_stream)
+                yield batch
+        finally:
+            stop.set()
+            thread.join()
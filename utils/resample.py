@@ -0,0 +1,110 @@
+import os
+from math import gcd
+from multiprocessing import Pool
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+# zero crossings of the windowed sinc on each side, cutoff relative to the
+# lower Nyquist frequency and Kaiser window beta of each quality
+QUALITIES = {'fast': (8, 0.90, 5.0),
+             'medium': (16, 0.94, 8.6),
+             'high': (32, 0.97, 12.0)}
+
+# polyphase filters keyed by (source rate, target rate, quality), read-only
+# so that forked workers share them
+_filters = {}
+
+
+def _rates(orig_sr, target_sr):
+    g = gcd(int(orig_sr), int(target_sr))
+    return int(target_sr) // g, int(orig_sr) // g
+
+
+def get_filter(orig_sr, target_sr, quality='medium'):
+    r"""Anti-aliasing FIR filter resampling from ```orig_sr``` to
+    ```target_sr```, designed once per rate pair and quality"""
+    key = (orig_sr, target_sr, quality)
+    h = _filters.get(key)
+    if h is None:
+        if quality not in QUALITIES:
+            raise ValueError(" !! Unknown resampling quality {}".format(
+                quality))
+        zeros, rolloff, beta = QUALITIES[quality]
+        up, down = _rates(orig_sr, target_sr)
+        max_rate = max(up, down)
+        h = signal.firwin(2 * zeros * max_rate + 1, rolloff / max_rate,
+                          window=('kaiser', beta)).astype(np.float32)
+        h.flags.writeable = False
+        h = _filters.setdefault(key, h)
+    return h
+
+
+def resample(wav, orig_sr, target_sr, quality='medium'):
+    r"""Polyphase resampling of a float waveform to
+    ceil(len(wav) * target_sr / orig_sr) samples.
+
+    ```quality``` trades speed for a sharper anti-aliasing filter: 'fast'
+    (8 zero crossings), 'medium' (16) or 'high' (32).
+    """
+    if orig_sr == target_sr:
+        return wav
+    up, down = _rates(orig_sr, target_sr)
+    return signal.resample_poly(wav, up, down,
+                                window=get_filter(orig_sr, target_sr,
+                                                  quality))
+
+
+def load_wav(path, sample_rate, quality='medium'):
+    r"""Read a sound file as a mono float32 waveform at ```sample_rate```,
+    like librosa.core.load but with the cached polyphase filters"""
+    wav, orig_sr = sf.read(path, dtype='float32', always_2d=True)
+    wav = wav.mean(axis=1) if wav.shape[1] > 1 else wav[:, 0]
+    return np.asarray(resample(wav, orig_sr, sample_rate, quality),
+                      dtype=np.float32)
+
+
+def _resample_file(args):
+    item_id, wav_path, out_path, sample_rate, quality, subtype = args
+    try:
+        wav = load_wav(wav_path, sample_rate, quality)
+    except Exception as e:
+        return item_id, str(e)
+    sf.write(out_path, np.clip(wav, -1, 1), sample_rate, subtype=subtype)
+    return item_id, None
+
+
+def resample_files(items, root_path, sample_rate, quality='medium',
+                   num_workers=1, subtype='PCM_16'):
+    r"""Write a copy of a corpus at another sample rate.
+
+    Args:
+        items: list of (item_id, wav_path) tuples.
+        root_path: output folder, files are written as ```item_id```.wav.
+        sample_rate: target sample rate.
+        quality: resampling quality, see ```resample```.
+        num_workers: number of processes resampling files.
+        subtype: soundfile sample format of the written files.
+
+    Returns:
+        dict of item id to error message of the files that could not be
+        read.
+    """
+    os.makedirs(root_path, exist_ok=True)
+    print(" > Resampling {} wav files to {} Hz ({} quality) into {}".format(
+        len(items), sample_rate, quality, root_path))
+    jobs = [(item_id, wav_path, os.path.join(root_path, item_id + '.wav'),
+             sample_rate, quality, subtype) for item_id, wav_path in items]
+    failed = {}
+    pool = Pool(num_workers)
+    try:
+        for item_id, error in pool.imap_unordered(_resample_file, jobs,
+                                                  chunksize=16):
+            if error is not None:
+                failed[item_id] = error
+                print(" !! Cannot read file : {} ({})".format(item_id, error))
+    finally:
+        pool.close()
+        pool.join()
+    print(" | > {} files written".format(len(items) - len(failed)))
+    return failed
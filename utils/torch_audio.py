@@ -0,0 +1,88 @@
+import torch
+from torch import nn
+
+
+class TorchAudioProcessor(nn.Module):
+    r"""Torch port of the AudioProcessor feature pipeline (preemphasis,
+    STFT, mel projection, dB conversion and normalization), so that
+    training targets are computed in batch on the training device from
+    padded raw waveforms.
+
+    Features match AudioProcessor.spectrogram/melspectrogram within float32
+    tolerance on all frames. Both STFTs are centered with zero padding, so
+    the batch padding after shorter items gives their last frames the
+    same zeros as an item processed alone.
+
+    Args:
+        ap: AudioProcessor to take the parameters from.
+    """
+
+    def __init__(self, ap):
+        super(TorchAudioProcessor, self).__init__()
+        self.n_fft, self.hop_length, self.win_length = ap._stft_parameters()
+        self.preemphasis = ap.preemphasis
+        self.min_level_db = ap.min_level_db
+        self.ref_level_db = ap.ref_level_db
+        self.register_buffer('window', torch.hann_window(self.win_length))
+        self.register_buffer('mel_basis', torch.tensor(
+            ap._get_mel_basis(), dtype=torch.float32))
+
+    def _apply_preemphasis(self, x):
+        return torch.cat([x[:, :1], x[:, 1:] - self.preemphasis * x[:, :-1]],
+                         dim=1)
+
+    def _amp_to_db(self, x):
+        return 20 * torch.log10(torch.clamp(x, min=1e-5))
+
+    def _normalize(self, S):
+        return torch.clamp((S - self.min_level_db) / -self.min_level_db, 0, 1)
+
+    def num_frames(self, wav_lengths):
+        return wav_lengths // self.hop_length + 1
+
+    def forward(self, wav, wav_lengths=None):
+        r"""B x N waveforms to B x F x T linear and B x M x T mel
+        spectrograms. With ```wav_lengths``` the samples after the end of
+        each item are zeroed after preemphasis, which would otherwise leak
+        the last sample into the padding."""
+        x = self._apply_preemphasis(wav)
+        if wav_lengths is not None:
+            steps = torch.arange(x.shape[1], device=x.device)
+            x = x * (steps.unsqueeze(0) <
+                     wav_lengths.unsqueeze(1)).to(x.dtype)
+        D = torch.stft(x, self.n_fft,
+                       hop_length=self.hop_length, win_length=self.win_length,
+                       window=self.window, center=True, pad_mode='constant',
+                       return_complex=True)
+        S = D.abs()
+        linear = self._normalize(self._amp_to_db(S) - self.ref_level_db)
+        mel = self._amp_to_db(torch.matmul(self.mel_basis, S))
+        mel = self._normalize(mel - self.ref_level_db)
+        return linear, mel
+
+    def batch_targets(self, wav, wav_lengths, outputs_per_step):
+        r"""Compute training targets with the layout of
+        LJSpeechDataset.collate_fn from padded waveforms.
+
+        Returns:
+            linear (B x T x F), mel (B x T x M), mel_lengths and stop
+            targets, padded with a zero frame to a multiple of
+            ```outputs_per_step```.
+        """
+        with torch.no_grad():
+            wav_lengths = wav_lengths.to(wav.device)
+            linear, mel = self.forward(wav, wav_lengths)
+            lengths = self.num_frames(wav_lengths)
+            max_len = int(lengths.max()) + 1  # zero-frame
+            remainder = max_len % outputs_per_step
+            pad_len = max_len + (outputs_per_step - remainder) \
+                if remainder > 0 else max_len
+            steps = torch.arange(pad_len, device=wav.device)
+            stop_targets = (steps.unsqueeze(0) >=
+                            lengths.unsqueeze(1)).float()
+            mask = 1 - stop_targets[:, :linear.shape[2]].unsqueeze(2)
+            linear_out = wav.new_zeros(wav.shape[0], pad_len, linear.shape[1])
+            mel_out = wav.new_zeros(wav.shape[0], pad_len, mel.shape[1])
+            linear_out[:, :linear.shape[2]] = linear.transpose(1, 2) * mask
+            mel_out[:, :mel.shape[2]] = mel.transpose(1, 2) * mask
+        return linear_out, mel_out, lengths + 1, stop_targets
@@ -0,0 +1,141 @@
+import struct
+import tempfile
+import numpy as np
+
+GAINS = [None, 'peak', 'limiter']
+# data size written in the header when the output cannot be patched
+_UNKNOWN_SIZE = 0xFFFFFFFF
+_HEADER_SIZE = 44
+
+
+def wav_header(sample_rate, num_samples=None):
+    r"""44 byte RIFF header of mono 16 bit PCM, with the sizes set to
+    0xFFFFFFFF if ```num_samples``` is unknown (streaming convention)"""
+    if num_samples is None:
+        data_size = riff_size = _UNKNOWN_SIZE
+    else:
+        data_size = 2 * num_samples
+        riff_size = data_size + _HEADER_SIZE - 8
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', riff_size, b'WAVE',
+                       b'fmt ', 16, 1, 1, sample_rate, 2 * sample_rate, 2, 16,
+                       b'data', data_size)
+
+
+class WavWriter(object):
+    r"""Write a waveform as 16 bit PCM WAV from chunks as they come.
+
+    Chunks are scaled and converted to int16 ```block_size``` samples at a
+    time, so memory does not grow with the length of the audio and the
+    caller's arrays are never modified. On seekable outputs (files,
+    BytesIO) the RIFF header sizes are patched at ```close```, on pipes
+    they are left as 0xFFFFFFFF.
+
+    Args:
+        f: path or binary file object to write to.
+        sample_rate: sampling rate of the waveform.
+        gain: None to write samples as is (clipped to [-1, 1]), 'peak' to
+            scale by the global peak like AudioProcessor.save_wav or
+            'limiter' for a running peak limiter.
+        peak: known global peak of the waveform for 'peak'. Without it,
+            chunks are spooled to a temporary file and written at close.
+        block_size: number of samples converted at once.
+        release: per block decay of the peak tracked by 'limiter', lower
+            values recover gain faster after loud passages.
+    """
+
+    def __init__(self, f, sample_rate, gain='peak', peak=None,
+                 block_size=8192, release=0.9):
+        if gain not in GAINS:
+            raise ValueError(" !! Unknown gain {}".format(gain))
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.block_size = block_size
+        self.release = release
+        self.num_samples = 0
+        self._own_file = isinstance(f, str)
+        self._file = open(f, 'wb') if self._own_file else f
+        try:
+            self._seekable = self._file.seekable()
+        except (AttributeError, OSError):
+            self._seekable = False
+        self._start = self._file.tell() if self._seekable else 0
+        self._buffer = np.empty(block_size, dtype=np.float32)
+        self._spool = None
+        self._peak = 0.01
+        self._scale = 32767 / 0.01
+        if gain == 'peak':
+            if peak is None:
+                self._spool = tempfile.TemporaryFile()
+                return
+            self._scale = 32767 / max(0.01, peak)
+        elif gain is None:
+            self._scale = 32767.
+        self._file.write(wav_header(sample_rate))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, wav):
+        r"""Append a chunk of float samples"""
+        wav = np.asarray(wav)
+        if self._spool is not None:
+            self._peak = max(self._peak, float(np.abs(wav).max(initial=0)))
+            self._spool.write(wav.astype('<f4', copy=False).tobytes())
+            return
+        for start in range(0, len(wav), self.block_size):
+            self._write_block(wav[start:start + self.block_size])
+
+    def _limiter_gains(self, block):
+        # instant attack when the block is louder than the tracked peak,
+        # gain ramps up over the block once it decays
+        peak = float(np.abs(block).max(initial=0))
+        self._peak = max(self._peak * self.release, peak, 0.01)
+        scale = 32767 / self._peak
+        if scale <= self._scale:
+            self._scale = scale
+            return scale
+        gains = np.linspace(self._scale, scale, len(block) + 1,
+                            dtype=np.float32)[1:]
+        self._scale = scale
+        return gains
+
+    def _write_block(self, block):
+        out = self._buffer[:len(block)]
+        gain = self._limiter_gains(block) if self.gain == 'limiter' \
+            else self._scale
+        np.multiply(block, gain, out=out)
+        np.clip(out, -32767, 32767, out=out)
+        self._file.write(out.astype('<i2').tobytes())
+        self.num_samples += len(block)
+
+    def close(self):
+        r"""Flush spooled audio, patch the header and close the output if
+        it was opened here"""
+        if self._file is None:
+            return
+        if self._spool is not None:
+            # the length is known now, so the header is written once
+            self._scale = 32767 / self._peak
+            num_samples = self._spool.tell() // 4
+            self._file.write(wav_header(self.sample_rate, num_samples))
+            self._spool.seek(0)
+            while True:
+                block = self._spool.read(4 * self.block_size)
+                if not block:
+                    break
+                self._write_block(np.frombuffer(block, dtype='<f4'))
+            self._spool.close()
+            self._spool = None
+        elif self._seekable:
+            end = self._file.tell()
+            self._file.seek(self._start)
+            self._file.write(wav_header(self.sample_rate, self.num_samples))
+            self._file.seek(end)
+        if self._own_file:
+            self._file.close()
+        else:
+            self._file.flush()
+        self._file = None